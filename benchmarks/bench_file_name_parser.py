@@ -0,0 +1,67 @@
+"""
+Benchmark of FileNameParser name parsing on large directory listings.
+Compares the compiled regex matcher against the strptime path
+that tries every subset pattern in turn.
+
+Run from the repository root:
+    python benchmarks/bench_file_name_parser.py [number of names]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+from pygranule.file_name_parser import FileNameParser, _subset_filename_expansion
+
+
+def legacy_time_from_filename(parser, filename):
+    """ the strptime based time_from_filename, as before the compiled regex """
+    subset_patterns = [ x[0] for x in _subset_filename_expansion(parser.pattern,parser.subsets) ]
+    for p in subset_patterns:
+        try:
+            t = datetime.strptime(filename, p)
+            if filename in parser.filenames_from_time(t):
+                return t
+        except ValueError:
+            continue
+    return None
+
+def make_listing(parser, n):
+    """ n file names, every tenth one invalid """
+    names = []
+    t = datetime(2014,1,1)
+    while len(names) < n:
+        for i, f in enumerate(parser.filenames_from_time(t)):
+            if i%10 == 0:
+                f = f.replace("___-0000", "___-X000")
+            names.append(f)
+        t += timedelta(minutes=15)
+    return names[:n]
+
+def timed(func, names):
+    t0 = time.time()
+    result = [ func(f) for f in names ]
+    return time.time()-t0, result
+
+def main(n):
+    parser = FileNameParser("/seviri/{0}/H-000-MSG3__-MSG3________-{0}___-00000{1}___-%Y%m%d%H%M",
+                            "{IR_108:{1..8}, WV_073:{1..8}, IR_120:{1..8}, VIS006:{1..8}}")
+    names = make_listing(parser, n)
+
+    dt_regex, result_regex = timed(parser.time_from_filename, names)
+    # the legacy path is slow, time a sample and extrapolate
+    sample = names[:max(1,n/20)]
+    dt_legacy, result_legacy = timed(lambda f: legacy_time_from_filename(parser, f), sample)
+    dt_legacy *= float(len(names))/len(sample)
+
+    assert result_regex[:len(sample)] == result_legacy
+
+    print "names:              %d"%(len(names))
+    print "compiled regex:     %.3f s  (%.2f us/name)"%(dt_regex, 1e6*dt_regex/len(names))
+    print "legacy strptime:    %.3f s  (%.2f us/name, extrapolated)"%(dt_legacy, 1e6*dt_legacy/len(names))
+    print "speedup:            %.1fx"%(dt_legacy/dt_regex)
+
+if __name__ == "__main__":
+    n = 100000
+    if len(sys.argv) > 1:
+        n = int(sys.argv[1])
+    main(n)
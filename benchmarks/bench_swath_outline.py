@@ -0,0 +1,95 @@
+"""
+Benchmark of swath outline generation, vertex count and runtime against
+accuracy.  Compares the fixed time step outlines (100th and 1000th steps
+of the orbit) with adaptive outlines refined to a tolerance in meters.
+Accuracy is the Hausdorff distance (meters, working projection) to an
+outline at 20000th steps of the orbit, of granules centered on the
+transits over the area of interest.  Granules shorter than the layer
+adaptive_outline_min_period are outlined at even 1000th steps of the
+orbit within any tolerance, pass a shorter period to refine them too.
+
+Run from the repository root:
+    python benchmarks/bench_swath_outline.py [number of days [adaptive outline min period]]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+import numpy as np
+
+from pygranule.pyorbital_layer import PyOrbitalLayer
+from pygranule.orbital_layer import _outline_segments, _segments_polygon
+
+
+def fixed_step_outline(layer, start, period, t_step):
+    """
+    the fixed step outline, as swath_working_projection without a swath
+    ribbon, its last scan line is the first step at or past period
+    """
+    t_steps = np.arange(0.0, period+t_step, t_step)
+    lons, lats = layer.scan_lines_lonlats([ start + timedelta(minutes=dt) for dt in t_steps ])
+    xs, ys = layer.proj(lons, lats)
+    return _outline_segments(np.asarray(xs), np.asarray(ys), layer.proj_out_of_bounds_value)
+
+def reference_outline(layer, start, period):
+    t_steps = np.linspace(0.0, period, int(np.ceil(period*20000.0/layer.orbital_period()))+1)
+    lons, lats = layer.scan_lines_lonlats([ start + timedelta(minutes=dt) for dt in t_steps ])
+    xs, ys = layer.proj(lons, lats)
+    return _outline_segments(np.asarray(xs), np.asarray(ys), layer.proj_out_of_bounds_value)
+
+def adaptive_outline(layer, start, period, tolerance):
+    layer.outline_tolerance = tolerance
+    lonlats = layer.swath_lonlats(start, period)
+    layer.outline_tolerance = None
+    return [np.array(layer.proj(*lonlats))]
+
+def measure(outline, references):
+    """ total vertices, runtime and worst Hausdorff distance over the granules """
+    vertices = 0
+    error = 0.0
+    t0 = time.time()
+    outlines = [ outline(start, period) for start, period, reference in references ]
+    dt = time.time()-t0
+    for segments, (start, period, reference) in zip(outlines, references):
+        vertices += sum( x.shape[1] for x in segments )
+        error = max(error, _segments_polygon(segments).hausdorff_distance(reference))
+    return vertices, dt, error
+
+def main(days, adaptive_min_period=None):
+    layer = PyOrbitalLayer( ((-25,62.5),(-25,67),(-13,67),(-13,62.5)), "NOAA 19", "AVHRR" )
+    layer.set_tle("1 29499U 06044A   11254.96536486  .00000092  00000-0  62081-4 0  5221",
+                  "2 29499  98.6804 312.6735 0001758 111.9178 248.2152 14.21501774254058")
+    if adaptive_min_period is not None:
+        layer.adaptive_outline_min_period = adaptive_min_period
+    t = datetime(2014,1,23)
+    transits = layer.transits(t, t + timedelta(days=days))
+    orbital_period = layer.orbital_period()
+
+    methods = [("fixed, 100th orbit", lambda s, p: fixed_step_outline(layer, s, p, orbital_period/100.0)),
+               ("fixed, 1000th orbit", lambda s, p: fixed_step_outline(layer, s, p, orbital_period/1000.0))]
+    for tolerance in (50.0, 500.0, 5000.0):
+        methods.append( ("adaptive, %g m"%(tolerance),
+                         lambda s, p, tolerance=tolerance: adaptive_outline(layer, s, p, tolerance)) )
+
+    print "granules centered on %d transits"%(len(transits))
+    for period in (1.0, 5.0, 15.0):
+        references = []
+        for transit in transits:
+            start = transit - timedelta(minutes=period/2.0)
+            reference = _segments_polygon(reference_outline(layer, start, period))
+            if not reference.is_empty:
+                references.append( (start, period, reference) )
+        print
+        print "%g minute granules:"%(period)
+        print "  %-22s %10s %12s %18s"%("outline", "vertices", "runtime", "max error")
+        for name, outline in methods:
+            vertices, dt, error = measure(outline, references)
+            print "  %-22s %10d %10.1f ms %16.0f m"%(name, vertices, 1e3*dt, error)
+
+if __name__ == "__main__":
+    days = 1
+    if len(sys.argv) > 1:
+        days = int(sys.argv[1])
+    adaptive_min_period = None
+    if len(sys.argv) > 2:
+        adaptive_min_period = float(sys.argv[2])
+    main(days, adaptive_min_period)
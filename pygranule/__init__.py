@@ -3,9 +3,10 @@ import os
 from . import tests
 from .file_name_parser import FileNameParser
 
-from .granule_filter import GranuleFilterError
+from .granule_filter import GranuleFilterError, GranuleRecord
 from .orbital_granule_filter import OrbitalGranuleFilter
 from .periodic_granule_filter import PeriodicGranuleFilter
+from .granule_filter_set import GranuleFilterSet
 
 def get_granule_filters(config_file_path=None):
     """ reads config file and generates granule filters """
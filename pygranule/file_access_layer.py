@@ -6,6 +6,7 @@ from abc import ABCMeta, abstractmethod
 
 import os
 import shutil
+from multiprocessing.pool import ThreadPool
 
 def make_dirs(path, os_obj = None):
     if os_obj is not None:
@@ -50,6 +51,34 @@ class FileAccessLayer(object):
         """
         pass
 
+    def list_source_directories(self, directories, threads=4):
+        """
+        Lists several directories on the source file system,
+        up to threads directories concurrently.
+        Directories that do not exist list as empty.
+        Returns a single list of filename paths, in directory order.
+        """
+        directories = list(directories)
+        if threads <= 1 or len(directories) <= 1:
+            listings = [ self._list_source_directory_or_empty(d) for d in directories ]
+        else:
+            pool = ThreadPool(min(threads, len(directories)))
+            try:
+                listings = pool.map(self._list_source_directory_or_empty, directories)
+            finally:
+                pool.close()
+                pool.join()
+        files = []
+        for listing in listings:
+            files += listing
+        return files
+
+    def _list_source_directory_or_empty(self, directory):
+        try:
+            return self.list_source_directory(directory)
+        except (OSError, IOError):
+            return []
+
     def list_local_directory(self, directory):
         """
         Lists directory on the local file system
@@ -62,6 +91,17 @@ class FileAccessLayer(object):
         """
         return [ directory + '/' + x for x in self.os.listdir(directory) if self.os.path.isfile(directory+'/'+x) ]
 
+    def scan_local_directory(self, directory):
+        """
+        Lists all entries of directory on the local file system, for
+        name lookups (e.g. destination indexes), with a single directory
+        read and no stat of each entry, unlike list_local_directory.
+        A missing directory lists as empty.
+        """
+        if not self.os.path.isdir(directory):
+            return []
+        return [ directory + '/' + x for x in self.os.listdir(directory) ]
+
     def copy_file(self, source, destination):
         make_dirs(destination, os_obj = self.os)
         self._copy_file(source, destination)
@@ -1,6 +1,8 @@
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from os.path import dirname
+import re
+import numpy as np
 
 def file_name_translator( filelist_A, parser_A, parser_B ):
     """
@@ -8,14 +10,16 @@ def file_name_translator( filelist_A, parser_A, parser_B ):
     parser_A to parser_B. Returns a list of translated filename paths.
     """
     filelist_B = []
+    parse = parser_A.parse
+    filename = parser_B.filename
 
     for f_A in filelist_A:
-        # extract time code and subset
-        t = parser_A.time_from_filename(f_A)
-        subset = parser_A.subset_from_filename(f_A)
-        # generate target filename
-        f_B = parser_B.filename(t,subset)
-        filelist_B.append(f_B)
+        # extract time code and subset in a single parse
+        result = parse(f_A)
+        if result is None:
+            raise ValueError("Invalid filename '%s' -> No translation"%(f_A))
+        # generate target filename from precompiled template
+        filelist_B.append(filename(*result))
 
     return filelist_B
 
@@ -36,16 +40,37 @@ class FileNameParser(object):
             self.subsets = {}
         else:
             self.subsets = _dict_subset_expression(subsets)
+
+        # expand the subset tree once, into an immutable table
+        # of (subset pattern, subset tuple) entries
+        self.subset_table = tuple( _subset_filename_expansion(self.pattern,self.subsets) )
+        # subset codes, as returned by parse_many, index subset_tuples
+        self.subset_tuples = tuple( x[1] for x in self.subset_table )
+        self.subset_codes = dict( (x,i) for i, x in enumerate(self.subset_tuples) )
+        # index subset table entries by the literal prefix of their pattern
+        self._prefix_index, self._prefix_lengths = _prefix_index(self.subset_table)
+        # unique directory patterns, in subset table order
+        self._directory_patterns = []
+        for x, subset in self.subset_table:
+            if dirname(x) not in self._directory_patterns:
+                self._directory_patterns.append(dirname(x))
+        self._directory_patterns = tuple(self._directory_patterns)
+
+        # compile the pattern and subset alternatives into a
+        # single regular expression (None if pattern is not supported)
+        self.tokens = _tokenize_pattern(self.pattern)
+        # precompiled str.format template, rendering time and subset at once
+        self.template = _compile_pattern_template(self.tokens)
+        self._subset_time_templates = None
+        self.regex, self._subset_groups, self._subset_lookup = _compile_pattern_regex(self.tokens,
+                                                                                      self.subset_tuples)
     
     def filename(self, t, subset):
         """
         Applies time code and subset selection,
         returning a single valid granule file name path.
         """
-        # apply datetime formatting
-        pattern_w_t = t.strftime(self.pattern)
-
-        return pattern_w_t.format(*subset)
+        return self.template.format(*subset, t=t)
 
     def filenames_from_time(self,t):
         """ 
@@ -59,40 +84,141 @@ class FileNameParser(object):
         pattern_w_t = t.strftime(self.pattern)
 
         # apply subset filename expansion
-        if self.subsets is None:
-            paths = [pattern_w_t]
-        else:
-            paths = [ x[0] for x in _subset_filename_expansion(pattern_w_t, self.subsets) ]
-            
-        return paths
+        return [ pattern_w_t.format(*subset) for subset in self.subset_tuples ]
 
-    def time_from_filename(self, filename):
+    def filenames_from_time_range(self, start, end, step):
         """
-        Attempt to extract a datetime from filename.
-        Returns datetime if successful, else None.
+        Generator yielding all legal filenames for the time stamps
+        start, start+step, start+2*step, ... within [start, end).
+        Filenames of each time stamp are yielded in subset table order.
+        Only datetime fields that changed since the previous time stamp
+        are re-rendered.
+        """
+        if step <= timedelta(0):
+            raise ValueError("Time range step must be positive")
+        templates = self._time_templates()
+        directives = set( value for kind, value in self.tokens if kind == 'time' )
+        fields = {}
+        last_keys = {}
+        i = 0
+        t = start
+        while t < end:
+            components = {'date':t.date(), 'hour':t.hour, 'minute':t.minute, 'second':t.second}
+            for d in directives:
+                key = components.get(_directive_dependency.get(d), t)
+                if d not in last_keys or last_keys[d] != key:
+                    fields[d] = _directive_template.get(d, '{t:%'+d+'}').format(t=t)
+                    last_keys[d] = key
+            for template in templates:
+                yield template%fields
+            i += 1
+            t = start + i*step
+
+    def _time_templates(self):
+        """
+        Per subset printf style templates, with subsets filled in and
+        datetime directives as named fields.  Built on first use.
+        """
+        if self._subset_time_templates is None:
+            self._subset_time_templates = tuple( _compile_time_template(self.tokens, subset)
+                                                 for subset in self.subset_tuples )
+        return self._subset_time_templates
+
+    def parse(self, filename):
+        """
+        Attempt to extract both datetime and subset from filename
+        in a single pass.
+        Returns tuple (datetime, subset tuple) if successful, else None.
+        """
+        if self.regex is None:
+            return self._parse_strptime(filename)
+
+        m = self.regex.match(filename)
+        if m is None:
+            return None
+        fields = m.groupdict()
+        # subset combination must exist in the subset tree
+        key = tuple( fields[name] for name in self._subset_groups )
+        subset = self._subset_lookup.get(key)
+        if subset is None:
+            return None
+        try:
+            t = _datetime_from_fields(fields)
+        except ValueError:
+            return None
+        # the time stamp must render back to the same filename
+        if self.filename(t, subset) != filename:
+            return None
+        return t, subset
+
+    def parse_many(self, filenames):
+        """
+        Parses a whole listing of filenames in one go.
+        Returns a tuple of numpy arrays (times, subset codes, valid),
+        where times are datetime64[us] (NaT where invalid), subset codes
+        index subset_tuples (-1 where invalid) and valid is a boolean mask.
         """
-        # extract subset patterns
-        subset_patterns = [ x[0] for x in _subset_filename_expansion(self.pattern,self.subsets) ]
+        return self.parse_arrays([ self.parse(f) for f in filenames ])
 
-        # try to extract a datetime
-        for p in subset_patterns:
+    def parse_arrays(self, results):
+        """
+        The (times, subset codes, valid) arrays of parse_many, from a list
+        of results of parse, e.g. of a listing already parsed elsewhere.
+        """
+        times = []
+        codes = []
+        for result in results:
+            if result is None:
+                times.append(None)
+                codes.append(-1)
+            else:
+                times.append(result[0])
+                codes.append(self.subset_codes[result[1]])
+        codes = np.array(codes, dtype=int)
+        return np.array(times, dtype='datetime64[us]'), codes, codes >= 0
+
+    def _parse_strptime(self, filename):
+        """
+        Slow path of parse, trying strptime against the subset patterns
+        sharing a literal prefix with filename.
+        Used when the pattern holds datetime directives that the
+        compiled regular expression does not support.
+        """
+        for p, subset in self._prefix_candidates(filename):
             try:
                 t = datetime.strptime(filename, p)
-                if filename in self.filenames_from_time(t):
-                    return t
             except ValueError:
                 continue
+            if self.filename(t, subset) == filename:
+                return t, subset
         return None
 
+    def _prefix_candidates(self, filename):
+        """
+        Returns the subset table entries whose literal pattern
+        prefix matches the start of filename.
+        """
+        candidates = []
+        for n in self._prefix_lengths:
+            candidates.extend( self._prefix_index.get(filename[:n], ()) )
+        return candidates
+
+    def time_from_filename(self, filename):
+        """
+        Attempt to extract a datetime from filename.
+        Returns datetime if successful, else None.
+        """
+        result = self.parse(filename)
+        if result is None:
+            return None
+        return result[0]
+
     def validate_filename(self, filename):
         """
         Check if input file name matches the file name pattern
         Returns True of False.
         """
-        if self.time_from_filename(filename) is None:
-            return False
-        else:
-            return True
+        return self.parse(filename) is not None
 
     def subset_from_filename(self, filename):
         """
@@ -100,18 +226,10 @@ class FileNameParser(object):
         Returns tuple of subset names if filename is valid, 
         else throw ValueError.
         """
-        if self.validate_filename(filename):
-            pattern_w_t = self.time_from_filename(filename).strftime(self.pattern)
-            if self.subsets is None:
-                return ()
-            else:
-                paths = _subset_filename_expansion(pattern_w_t, self.subsets)
-                for i,p in enumerate(paths):
-                    if filename == p[0]:
-                        return p[1]
-            
-        else:
+        result = self.parse(filename)
+        if result is None:
             raise ValueError("Invalid filename -> No subset extracted")
+        return result[1]
 
     def directories(self, t = datetime.now() ):
         """
@@ -123,23 +241,219 @@ class FileNameParser(object):
         pattern.  The datetime argument is used to expand this
         pattern.
         """
-        # extract subset patterns
-        subset_patterns = [ x[0] for x in _subset_filename_expansion(self.pattern,self.subsets) ]
-
-        # basename them and make unique
-        directories = []
-        for x in subset_patterns:
-            if dirname(x) not in directories:
-                directories.append(dirname(x))
+        directories = list(self._directory_patterns)
 
         # expand time code if necessary,
         if '%' in directories[0]:
-            for i, in enumerate(directories):
-                directories[i] = t.strftime( directories[i] )
+            directories = [ t.strftime(d) for d in directories ]
+
+        return directories
 
+    def directories_from_time_range(self, start, end):
+        """
+        Returns the list of distinct directories where files
+        time stamped within [start, end] should be located,
+        in time order.  The window is stepped by the finest
+        datetime directive of the directory patterns.
+        """
+        if end < start:
+            return []
+        directives = set( re.findall(r'%(.)', ''.join(self._directory_patterns)) )
+        directives.discard('%')
+        if len(directives) == 0:
+            return self.directories(t = start)
+        step = min( _dependency_step[_directive_dependency.get(x)] for x in directives )
+
+        directories = []
+        seen = set()
+        t = start
+        while True:
+            for d in self.directories(t = t):
+                if d not in seen:
+                    seen.add(d)
+                    directories.append(d)
+            if t == end:
+                break
+            t = min(t + step, end)
         return directories
 
 
+# datetime directives supported by the compiled filename regex
+_directive_regex = {'Y':r'\d{4}',
+                    'y':r'\d{2}',
+                    'm':r'\d{2}',
+                    'd':r'\d{2}',
+                    'j':r'\d{3}',
+                    'H':r'\d{2}',
+                    'M':r'\d{2}',
+                    'S':r'\d{2}'}
+
+def _tokenize_pattern(pattern):
+    """
+    Splits a file name pattern into a list of tokens,
+    ('literal', text), ('time', directive) and ('subset', index).
+    Literal text is given as it appears in a generated filename.
+    """
+    tokens = []
+    literal = ""
+    auto_index = 0
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        nxt = pattern[i+1:i+2]
+        if c == '%' and nxt == '%':
+            literal += '%'
+            i += 2
+        elif c == '%' and nxt:
+            if literal:
+                tokens.append(('literal', literal))
+                literal = ""
+            tokens.append(('time', nxt))
+            i += 2
+        elif c in '{}' and nxt == c:
+            literal += c
+            i += 2
+        elif c == '{':
+            end = pattern.find('}', i)
+            if end < 0:
+                raise ValueError("Unbalanced braces in file name pattern '%s'"%(pattern))
+            field = pattern[i+1:end]
+            if field == "":
+                index = auto_index
+                auto_index += 1
+            else:
+                index = int(field)
+            if literal:
+                tokens.append(('literal', literal))
+                literal = ""
+            tokens.append(('subset', index))
+            i = end+1
+        else:
+            literal += c
+            i += 1
+    if literal:
+        tokens.append(('literal', literal))
+    return tokens
+
+def _compile_pattern_regex(tokens, subset_values):
+    """
+    Compiles pattern tokens and subset alternatives into a single
+    regular expression with named groups.
+    Returns (regex, subset group names, subset lookup), where the lookup
+    maps the captured subset group values to the full subset tuple.
+    The regex is None if the pattern can not be compiled.
+    """
+    lookup = {}
+    parts = []
+    seen = []
+    for kind, value in tokens:
+        if kind == 'literal':
+            parts.append(re.escape(value))
+            continue
+        if kind == 'time':
+            if value not in _directive_regex:
+                return None, (), lookup
+            name = 't_'+value
+            expr = _directive_regex[value]
+        else:
+            name = 's%d'%(value)
+            alternatives = set( v[value] for v in subset_values if len(v) > value )
+            if len(alternatives) == 0:
+                return None, (), lookup
+            alternatives = sorted(alternatives, key=len, reverse=True)
+            expr = '|'.join( re.escape(x) for x in alternatives )
+        if name in seen:
+            # repeated fields must hold the same value
+            parts.append('(?P=%s)'%(name))
+        else:
+            parts.append('(?P<%s>%s)'%(name, expr))
+            seen.append(name)
+
+    indices = sorted( int(name[1:]) for name in seen if name[0] == 's' )
+    for v in subset_values:
+        if all( i < len(v) for i in indices ):
+            lookup.setdefault(tuple( v[i] for i in indices ), v)
+    group_names = tuple( 's%d'%(i) for i in indices )
+
+    return re.compile(''.join(parts)+r'\Z'), group_names, lookup
+
+# datetime directives rendered from datetime attributes,
+# others are rendered through datetime.__format__ (strftime)
+_directive_template = {'Y':'{t.year:04d}',
+                       'm':'{t.month:02d}',
+                       'd':'{t.day:02d}',
+                       'H':'{t.hour:02d}',
+                       'M':'{t.minute:02d}',
+                       'S':'{t.second:02d}'}
+
+def _compile_pattern_template(tokens):
+    """
+    Compiles pattern tokens into a str.format template,
+    with subsets as positional fields and the datetime as field t.
+    """
+    parts = []
+    for kind, value in tokens:
+        if kind == 'literal':
+            parts.append(value.replace('{','{{').replace('}','}}'))
+        elif kind == 'time':
+            parts.append(_directive_template.get(value, '{t:%'+value+'}'))
+        else:
+            parts.append('{%d}'%(value))
+    return ''.join(parts)
+
+# the datetime component each directive's rendering depends on,
+# directives not listed are re-rendered for every time stamp
+_directive_dependency = {'Y':'date', 'y':'date', 'm':'date', 'd':'date', 'j':'date',
+                         'a':'date', 'A':'date', 'b':'date', 'B':'date', 'w':'date',
+                         'U':'date', 'W':'date', 'x':'date',
+                         'H':'hour', 'I':'hour', 'p':'hour',
+                         'M':'minute',
+                         'S':'second'}
+
+# time step over which a datetime component stays constant
+_dependency_step = {'date':timedelta(days=1),
+                    'hour':timedelta(hours=1),
+                    'minute':timedelta(minutes=1),
+                    'second':timedelta(seconds=1),
+                    None:timedelta(seconds=1)}
+
+def _compile_time_template(tokens, subset):
+    """
+    Compiles pattern tokens into a printf style template with
+    the subset filled in and datetime directives as named fields.
+    """
+    parts = []
+    for kind, value in tokens:
+        if kind == 'literal':
+            parts.append(value.replace('%','%%'))
+        elif kind == 'time':
+            parts.append('%%(%s)s'%(value))
+        else:
+            parts.append(subset[value].replace('%','%%'))
+    return ''.join(parts)
+
+def _datetime_from_fields(fields):
+    """ builds a datetime from the regex groups of a matched filename """
+    if fields.get('t_Y') is not None:
+        year = int(fields['t_Y'])
+    elif fields.get('t_y') is not None:
+        # same century convention as strptime
+        year = int(fields['t_y'])
+        year += 2000 if year < 69 else 1900
+    else:
+        year = 1900
+    hour = int(fields.get('t_H') or 0)
+    minute = int(fields.get('t_M') or 0)
+    second = int(fields.get('t_S') or 0)
+    if fields.get('t_j') is not None and fields.get('t_m') is None and fields.get('t_d') is None:
+        day_of_year = int(fields['t_j'])
+        if day_of_year < 1:
+            raise ValueError("day of year out of range")
+        return datetime(year, 1, 1, hour, minute, second) + timedelta(days=day_of_year-1)
+    month = int(fields.get('t_m') or 1)
+    day = int(fields.get('t_d') or 1)
+    return datetime(year, month, day, hour, minute, second)
+
 def _subset_filename_expansion(pattern, subset, values=()):
     """ 
     helper function for expanding subset filenames into filename path pattern 
@@ -148,7 +462,7 @@ def _subset_filename_expansion(pattern, subset, values=()):
     if len(subset)>0:
         L = []
         for key in subset:
-            L = L + _subset_filename_expansion(pattern, subset[key],values+(key,))
+            L.extend( _subset_filename_expansion(pattern, subset[key],values+(key,)) )
         return L
     else:
         # pad up missing values 
@@ -158,6 +472,21 @@ def _subset_filename_expansion(pattern, subset, values=()):
         # format pattern
         return [(pattern.format(*values),values)]
 
+def _prefix_index(subset_table):
+    """
+    Indexes subset table entries by the literal prefix of their pattern,
+    i.e. the text before the first datetime directive.
+    Returns (index dict, tuple of distinct prefix lengths).
+    """
+    index = {}
+    for entry in subset_table:
+        p = entry[0]
+        prefix = p[:p.find('%')] if '%' in p else p
+        index.setdefault(prefix, []).append(entry)
+    index = dict( (key, tuple(index[key])) for key in index )
+    lengths = tuple(sorted( set( len(key) for key in index ) ))
+    return index, lengths
+
 def _expand_subset_expression(s):
     s = _expand_doubledot(s)
     return s
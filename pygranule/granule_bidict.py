@@ -83,6 +83,10 @@ class GranuleBiDict(BiDict):
         """
         for key in self.fwd:
             self.gf_parent.file_access_layer.copy_file(key, self.fwd[key])
+        # record transfers in the parent's seen file journal, if any
+        journal = getattr(self.gf_parent, 'seen_file_journal', None)
+        if journal is not None:
+            journal.mark_transferred(self.fwd.keys())
         return self
 
 
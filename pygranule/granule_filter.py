@@ -1,18 +1,41 @@
 
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
+from itertools import islice
 from datetime import datetime, timedelta
-from .time_tools import floor_granule_datetime
+from .time_tools import granule_slots
 from .file_name_parser import FileNameParser, file_name_translator
 from .local_file_access_layer import LocalFileAccessLayer
 from .ssh_file_access_layer import SSHFileAccessLayer
 from .bidict import BiDict
 from .granule_bidict import GranuleBiDict
+from .lru_cache import LRUCache
+from .seen_file_journal import SeenFileJournal
 
 from abc import ABCMeta, abstractmethod
 
+import numpy as np
 import os
 
 
+# Compiled, immutable form of a filter configuration,
+# holding parsed durations, area of interest, file name parsers
+# and working projection parameters.  Picklable, so plans can be
+# shipped to worker processes.
+FilterPlan = namedtuple('FilterPlan', ['time_stamp_offset',
+                                       'granule_duration',
+                                       'time_step',
+                                       'time_step_offset',
+                                       'area_of_interest',
+                                       'working_projection',
+                                       'source_file_name_parser',
+                                       'destin_file_name_parser'])
+
+# A single filtered or translated granule, as yielded by the
+# iter_filter, iter_translate and iter_list_source generators.
+# time is the (offset corrected) time stamp, subset the subset tuple.
+GranuleRecord = namedtuple('GranuleRecord', ['source', 'destination', 'time', 'subset'])
+
+
 class GranuleFilter(object):
     id = 0 # object id. - static class var.
     """
@@ -40,7 +63,13 @@ class GranuleFilter(object):
             ('time_step_offset',None),
             ('subsets',None),
             ('area_of_interest',None),
-            ('file_destination_pattern',None)
+            ('file_destination_pattern',None),
+            ('validation_cache_size',None),
+            ('sampling_cache_size',None),
+            ('sampling_cache_path',None),
+            ('pass_table_horizon',None),
+            ('outline_tolerance',None),
+            ('seen_file_journal',None)
             ])
 
         # set configuration
@@ -72,6 +101,23 @@ class GranuleFilter(object):
             self.destin_file_name_parser = FileNameParser(self.config['file_destination_pattern'],
                                                           self.config['subsets'])
 
+        # compile configuration into plan, read by all hot paths
+        self.compile_plan()
+
+        # optional cache of validation verdicts and parsed metadata,
+        # keyed by file name
+        self.validation_cache = None
+        if self.config['validation_cache_size'] is not None:
+            self.validation_cache = LRUCache(int(self.config['validation_cache_size']))
+
+        # cache of aoi sampling verdicts, keyed by granule time stamp
+        self.sampling_cache = LRUCache(int(self.config['sampling_cache_size'] or 4096))
+
+        # optional journal of seen source files, for incremental list_new
+        self.seen_file_journal = None
+        if self.config['seen_file_journal'] is not None:
+            self.seen_file_journal = SeenFileJournal(self.config['seen_file_journal'])
+
         # instanciate file access parser, if set
         if self.config['protocol'] == "local":
             self.file_access_layer = LocalFileAccessLayer()
@@ -95,37 +141,164 @@ class GranuleFilter(object):
         and area of interest intersect.
         Returns True or False.
         """
-        # check file name pattern
-        if not self.file_name_parser.validate_filename(filename):
-            return False
-        # retrieve corrected time stamp
-        t = self.time_from_filename(filename)
-        # check time step match if set
-        if self.get_time_step():
-            t_flrd = floor_granule_datetime(t, self.get_time_step(), self.get_time_step_offset())
-            if t_flrd != t:
-                return False
-        # check aoi intersect
+        return self._validation_verdicts([filename], with_aoi=with_aoi)[0][0]
+
+    def _validation_verdicts(self, filepaths, with_aoi=True, processes=None, parsed=None, window=None):
+        """
+        Validates a list of file paths, parsing the listing once,
+        or not at all if parsed (dict of file path -> parse result) is given.
+        Returns a list of (verdict, time stamp, subset) tuples, one per
+        file path, where the time stamp is as parsed (not offset corrected).
+        Verdicts are taken from, and stored in, the validation cache if set.
+        processes is passed on to _sampling_verdicts.
+        If window, a (start, end) tuple of datetimes, is given, files with
+        corrected time stamps outside the window fail, without sampling
+        tests, and these verdicts are not cached.
+        """
+        plan = self.plan
+        cache = self.validation_cache
+        if cache is not None:
+            epoch = self._validation_epoch()
+            verdicts = [ cache.get((f, with_aoi, epoch)) for f in filepaths ]
+            todo = [ f for i, f in enumerate(filepaths) if verdicts[i] is None ]
+        else:
+            verdicts = [None]*len(filepaths)
+            todo = filepaths
+
+        # parse uncached names once
+        if parsed is None:
+            times, codes, valid = plan.source_file_name_parser.parse_many(todo)
+        else:
+            times, codes, valid = plan.source_file_name_parser.parse_arrays([ parsed[f] for f in todo ])
+        offset = plan.time_stamp_offset
+        corrected_times = times + np.timedelta64(offset)
+        # check time step match if set, for the whole listing at once
+        passed = valid.copy()
+        if plan.time_step:
+            on_grid = granule_slots(corrected_times, plan.time_step, plan.time_step_offset)[0]
+            passed &= on_grid
+        if window is not None:
+            in_window = ( (corrected_times >= np.datetime64(window[0], 'us')) &
+                          (corrected_times <= np.datetime64(window[1], 'us')) )
+        else:
+            in_window = valid
+
+        # check aoi intersect, once per distinct time stamp
         if with_aoi:
-            if not self.check_sampling_from_time(t):
-                return False
-        # success
-        return True
+            sampled = self._sampling_verdicts( [ corrected_times[i].astype(datetime)
+                                                 for i in np.flatnonzero(passed & in_window) ],
+                                               processes=processes )
+
+        subset_tuples = plan.source_file_name_parser.subset_tuples
+        new_verdicts = {}
+        for i, f in enumerate(todo):
+            if valid[i] and not in_window[i]:
+                new_verdicts[f] = (False, times[i].astype(datetime), subset_tuples[codes[i]])
+                continue
+            if valid[i]:
+                t = times[i].astype(datetime)
+                verdict = passed[i]
+                if verdict and with_aoi:
+                    verdict = sampled[t + offset]
+                verdict = (bool(verdict), t, subset_tuples[codes[i]])
+            else:
+                verdict = (False, None, None)
+            new_verdicts[f] = verdict
+            if cache is not None:
+                cache.put((f, with_aoi, epoch), verdict)
+
+        verdicts = [ v if v is not None else new_verdicts[filepaths[i]] for i, v in enumerate(verdicts) ]
+        if window is not None:
+            # cached verdicts of files outside the window
+            start, end = window
+            verdicts = [ v if not v[0] or start <= v[1] + offset <= end else (False,) + v[1:]
+                         for v in verdicts ]
+        return verdicts
+
+    def _sampling_verdicts(self, times, processes=None):
+        """
+        Evaluates check_sampling_from_time once for each distinct
+        (corrected) time stamp in times.
+        Returns a dict of time stamp -> True or False.
+        processes (a worker count or a pool / executor) is
+        ignored here, filters with costly sampling tests may
+        use it to evaluate time stamps in parallel.
+        """
+        sampled = {}
+        for t in times:
+            if t not in sampled:
+                sampled[t] = self.check_sampling_from_time(t)
+        return sampled
 
-    def filter(self, filepaths, with_aoi=True):
+    def _validation_epoch(self):
+        """
+        Part of the validation cache key that invalidates cached verdicts,
+        e.g. the orbital element epoch for orbital filters.
+        """
+        return None
+
+    def filter(self, filepaths, with_aoi=True, processes=None):
         """
         Filters a list of input file paths, returning
         only those that pass the validator test (see validate).
+        If processes is given, as a number of worker processes or
+        as a pool / executor object with a map method, area of interest
+        sampling tests are shared out among the workers.
         Returns a GranuleBiDict object.
         """
+        return self._filter(filepaths, with_aoi=with_aoi, processes=processes)
+
+    def _filter(self, filepaths, with_aoi=True, processes=None, parsed=None, window=None):
+        """
+        filter, where parsed is an optional dict of file path -> result
+        of parsing it with the source file name parser, for listings
+        already parsed (see GranuleFilterSet), and window an optional
+        (start, end) tuple of datetimes the corrected time stamps must lie in.
+        """
+        filepaths = list(filepaths)
+        verdicts = self._validation_verdicts(filepaths, with_aoi=with_aoi, processes=processes,
+                                             parsed=parsed, window=window)
+
         reduced_list = []
-        for path in filepaths:
-            if self.validate(path, with_aoi=with_aoi):
-                reduced_list.append(path)
+        reduced_times = []
+        reduced_subsets = []
+        for i, (verdict, t, subset) in enumerate(verdicts):
+            if verdict:
+                reduced_list.append(filepaths[i])
+                reduced_times.append(t)
+                reduced_subsets.append(subset)
 
         # returned GranuleBiDict
-        return self.translate(reduced_list)
+        return self._translate_parsed(reduced_list, reduced_times, reduced_subsets)
         
+    def iter_filter(self, filepaths, with_aoi=True, chunk_size=1000):
+        """
+        Generator variant of filter, yielding a GranuleRecord for
+        each file path passing the validator test, as soon as
+        its chunk of chunk_size file paths has been validated.
+        filepaths may be any iterable, e.g. another generator.
+        """
+        return self._iter_filter(filepaths, with_aoi=with_aoi, chunk_size=chunk_size)
+
+    def _iter_filter(self, filepaths, with_aoi=True, chunk_size=1000, window=None):
+        """
+        iter_filter, with an optional time window, as in _filter.
+        """
+        destin_parser = self.destin_file_name_parser
+        offset = self.plan.time_stamp_offset
+        filepaths = iter(filepaths)
+        while True:
+            chunk = list(islice(filepaths, chunk_size))
+            if len(chunk) == 0:
+                break
+            verdicts = self._validation_verdicts(chunk, with_aoi=with_aoi, window=window)
+            for i, (verdict, t, subset) in enumerate(verdicts):
+                if verdict:
+                    destination = None
+                    if destin_parser is not None:
+                        destination = destin_parser.filename(t, subset)
+                    yield GranuleRecord(chunk[i], destination, t + offset, subset)
+
     @abstractmethod
     def split(self, filepaths):
         """
@@ -142,17 +315,57 @@ class GranuleFilter(object):
         Return result as GranuleBiDict.
         Note: Operation does not pre-perform filtering.
         """
+        filepaths = list(filepaths)
         destin_list = self._translate(filepaths, reverse=reverse)
         if destin_list is None:
-            pairs = dict( (x,None) for i, x in enumerate(filepaths) )
+            pairs = dict( (x,None) for x in filepaths )
         else:
-            pairs = dict( (x,destin_list[i]) for i, x in enumerate(filepaths) )   
+            pairs = dict(zip(filepaths, destin_list))
         return GranuleBiDict(pairs, gf_parent=self)
 
 
+    def iter_translate(self, filepaths, reverse=False):
+        """
+        Generator variant of translate, yielding a GranuleRecord for
+        each input file path, with the input path as source and the
+        translated path as destination (None if there is no
+        destination pattern).  If reverse, input paths are
+        destination paths, translated back to source paths.
+        Note: Operation does not pre-perform filtering.
+        """
+        parser_A = self.source_file_name_parser
+        parser_B = self.destin_file_name_parser
+        if reverse:
+            parser_A, parser_B = parser_B, parser_A
+        offset = self.plan.time_stamp_offset
+        for f in filepaths:
+            result = parser_A.parse(f)
+            if result is None:
+                raise ValueError("Invalid filename '%s' -> No translation"%(f))
+            t, subset = result
+            destination = None
+            if parser_B is not None:
+                destination = parser_B.filename(t, subset)
+            yield GranuleRecord(f, destination, t + offset, subset)
+
+    def _translate_parsed(self, filepaths, times, subsets):
+        """
+        Translate already parsed source file paths, with their
+        (uncorrected) time stamps and subsets, to destination.
+        Return result as GranuleBiDict.
+        """
+        if self.destin_file_name_parser is not None and self.source_file_name_parser is not None:
+            filename = self.destin_file_name_parser.filename
+            pairs = dict( (x, filename(times[i], subsets[i])) for i, x in enumerate(filepaths) )
+        else:
+            pairs = dict( (x,None) for x in filepaths )
+        return GranuleBiDict(pairs, gf_parent=self)
+
     def _translate(self, filepaths, reverse=False):
         """
-        Translate source file name to destination filename list
+        Translate source file name to destination filename list.
+        Each name is parsed once, and rendered from the precompiled
+        template of the target parser.
         """
         if self.destin_file_name_parser is not None and self.source_file_name_parser is not None:
             if reverse:
@@ -205,7 +418,7 @@ class GranuleFilter(object):
         """
         pass
 
-    def list_source(self, t = datetime.now(), with_aoi=True):
+    def list_source(self, t=None, with_aoi=True):
         """
         Lists source directorie(s) 'remote filesystem'.
         Returns validated filename paths as
@@ -213,46 +426,105 @@ class GranuleFilter(object):
         to the equivalent destination file names.
 
         If directory pattern contains a date, then
-        the datetime argument must be used.
+        the datetime argument must be used, it defaults
+        to the current time.
         """
-        # expand pattern to list of source directories
-        directories = self.source_file_name_parser.directories(t = t)
-
-        filelist = []
-        # check files in the directories
-        for d in directories:
-            filelist += self.file_access_layer.list_source_directory(d)
+        filelist = self._list_source_files(t)
 
         # filter filelist
         filtered_bidict = self.filter(filelist, with_aoi=with_aoi)
 
         return filtered_bidict
 
+    def list_source_window(self, start, end, with_aoi=True):
+        """
+        As list_source, for the time window start to end.  All source
+        directories of the window are listed (concurrently), and only
+        files with (corrected) time stamps within the window are returned.
+        """
+        directories = self.source_file_name_parser.directories_from_time_range(start, end)
+        filelist = self.file_access_layer.list_source_directories(directories)
+        return self._filter(filelist, with_aoi=with_aoi, window=(start, end))
+
+    def iter_list_source(self, t=None, with_aoi=True, chunk_size=1000):
+        """
+        Generator variant of list_source, yielding a GranuleRecord
+        for each validated source file, listing one directory at a time.
+        """
+        for d in self.source_file_name_parser.directories(t = _now_if_none(t)):
+            listing = self.file_access_layer.list_source_directories([d])
+            for record in self.iter_filter(listing, with_aoi=with_aoi, chunk_size=chunk_size):
+                yield record
+
+    def iter_list_source_window(self, start, end, with_aoi=True, chunk_size=1000):
+        """
+        Generator variant of list_source_window, listing one directory at a time.
+        """
+        for d in self.source_file_name_parser.directories_from_time_range(start, end):
+            listing = self.file_access_layer.list_source_directories([d])
+            for record in self._iter_filter(listing, with_aoi=with_aoi, chunk_size=chunk_size,
+                                            window=(start, end)):
+                yield record
+
+    def _list_source_files(self, t):
+        """
+        Lists all files in the source directories for datetime t
+        (default the current time).
+        """
+        # expand pattern to list of source directories
+        directories = self.source_file_name_parser.directories(t = _now_if_none(t))
+
+        filelist = []
+        # check files in the directories
+        for d in directories:
+            filelist += self.file_access_layer.list_source_directory(d)
+        return filelist
 
     def list_destination(self, t = datetime.now()):
         """
         Lists destination directorie(s).
         Returns filename paths as BiDict object, 
         mapping destination file paths to the 
-        assosiated destination file names.
+        assosiated source file paths.
 
         If directory pattern contains a date, then
         the datetime argument must be used.
         """
-        # expand pattern to list of source directories
-        #directories = self.destin_file_name_parser.directories(t = t)
-
-        #destin_list = []
-        # check files in the directories
-        #for d in directories:
-        #    destin_list += self.file_access_layer.list_local_directory(d)
+        # expand pattern to list of destination directories
+        directories = self.destin_file_name_parser.directories(t = t)
 
-        # map file names to source file name paths
-        #source_list = file_name_translator(destin_list, 
-        #                                   self.destin_file_name_parser,
-        #                                   self.source_file_name_parser)
+        # scan each directory once
+        destin_list = []
+        for d in directories:
+            destin_list += self._scan_destination_directory(d)
+
+        # map file names to source file name paths, skipping foreign files
+        pairs = {}
+        for f in destin_list:
+            result = self.destin_file_name_parser.parse(f)
+            if result is not None:
+                pairs[f] = self.source_file_name_parser.filename(*result)
         # return BiDict
-        #return BiDict(dict(zip(destin_list, source_list)))
+        return BiDict(pairs)
+
+    def _scan_destination_directory(self, directory):
+        """
+        Lists a destination directory, as normalized paths.
+        An empty directory (file name only destination pattern)
+        is the current working directory.
+        """
+        return [ os.path.normpath(x) for x in self.file_access_layer.scan_local_directory(directory or '.') ]
+
+    def _destination_index(self, destin_paths):
+        """
+        Returns the set of normalized destination paths found at
+        destination, scanning each of the directories of destin_paths once.
+        """
+        directories = set( os.path.dirname(x) for x in destin_paths if x is not None )
+        found = set()
+        for d in directories:
+            found.update( self._scan_destination_directory(d) )
+        return found
 
     def list_new(self, t = datetime.now() ):
         """
@@ -262,15 +534,44 @@ class GranuleFilter(object):
 
         This method is particularly useful in periodic 
         triggering of fetching any new data.
-        """
-        # check source
-        source_files = self.list_source(t = t)
 
-        # check if files at destination
-        for sfile in source_files:
-            dfile = source_files[sfile]
-            if self.file_access_layer.check_for_local_file(dfile):
-                source_files.remove(sfile)
+        Destination folders are scanned once each, rather than
+        checking for each granule file individually.
+
+        If a seen file journal is set (config key 'seen_file_journal'),
+        only files not seen in earlier polls are parsed, validated and
+        checked at destination.  Rejected files, and files found at
+        destination, are recorded in the journal.  Rejections by area
+        of interest are recorded with the validation epoch (orbital
+        element epoch), and validated again once it changes.
+        """
+        journal = self.seen_file_journal
+        if journal is None:
+            # check source
+            source_files = self.list_source(t = t)
+        else:
+            # only process the delta since last poll
+            epoch = self._validation_epoch()
+            journal.epoch = epoch
+            filelist = [ f for f in self._list_source_files(t) if f not in journal ]
+            source_files = self.filter(filelist)
+            rejected = [ f for f in filelist if f not in source_files.fwd ]
+            if epoch is None:
+                journal.mark_rejected(rejected)
+            else:
+                # valid names rejected only by area of interest
+                by_aoi = self.filter(rejected, with_aoi=False)
+                journal.mark_rejected([ f for f in rejected if f not in by_aoi.fwd ])
+                journal.mark_rejected_by_aoi(list(by_aoi))
+
+        # difference of source and destination indexes
+        destin_index = self._destination_index(source_files.values())
+        found = [ sfile for sfile in source_files
+                  if source_files[sfile] is not None and os.path.normpath(source_files[sfile]) in destin_index ]
+        for sfile in found:
+            source_files.remove(sfile)
+        if journal is not None:
+            journal.mark_transferred(found)
 
         # return remaining files as BiDict
         return source_files
@@ -301,53 +602,53 @@ class GranuleFilter(object):
         else:
             return self.config[key]
 
+    def compile_plan(self):
+        """
+        Compiles the configuration into an immutable FilterPlan,
+        stored as the plan attribute and returned.
+        Call again if the configuration has been modified,
+        verdicts cached under the previous plan are dropped.
+        """
+        aoi=[]
+        if self._validated_config("area_of_interest") is not None:
+            for s in self._validated_config("area_of_interest").replace(" ","").replace("),",");").split(";"):
+                splt = s.strip().split(",")
+                aoi.append(( float(splt[0][1:]), float(splt[1][:-1]) ))
+        working_projection = None
+        if len(aoi) > 0:
+            # orthographic projection centered on the aoi
+            clon = sum( x for x, y in aoi )/len(aoi)
+            clat = sum( y for x, y in aoi )/len(aoi)
+            working_projection = (('proj','ortho'), ('lon_0',clon), ('lat_0',clat))
+
+        self.plan = FilterPlan(time_stamp_offset = _parse_duration(self.config["time_stamp_offset"], timedelta(0)),
+                               granule_duration = _parse_duration(self.config["granule_duration"]),
+                               time_step = _parse_duration(self.config["time_step"]),
+                               time_step_offset = _parse_duration(self.config["time_step_offset"], timedelta(0)),
+                               area_of_interest = tuple(aoi),
+                               working_projection = working_projection,
+                               source_file_name_parser = self.source_file_name_parser,
+                               destin_file_name_parser = self.destin_file_name_parser)
+        # caches are not yet set up on the first compilation
+        for cache in (getattr(self, 'validation_cache', None), getattr(self, 'sampling_cache', None)):
+            if cache is not None:
+                cache.clear()
+        return self.plan
+
     def get_time_stamp_offset(self):
-        if self.config["time_stamp_offset"]:
-            str_splt = self.config["time_stamp_offset"].split(":")
-            h = int(str_splt[0])
-            m = int(str_splt[1])
-            s = float(str_splt[2])
-            return timedelta(hours=h,minutes=m,seconds=s)
-        else:
-            return timedelta(0)
+        return self.plan.time_stamp_offset
 
     def get_granule_duration(self):
-        if self.config["granule_duration"]:
-            str_splt = self.config["granule_duration"].split(":")
-            h = int(str_splt[0])
-            m = int(str_splt[1])
-            s = float(str_splt[2])
-            return timedelta(hours=h,minutes=m,seconds=s)
-        else:
-            return None
+        return self.plan.granule_duration
 
     def get_time_step(self):
-        if self.config["time_step"]:
-            str_splt = self.config["time_step"].split(":")
-            h = int(str_splt[0])
-            m = int(str_splt[1])
-            s = float(str_splt[2])
-            return timedelta(hours=h,minutes=m,seconds=s)
-        else:
-            return None
+        return self.plan.time_step
 
     def get_time_step_offset(self):
-        if self.config["time_step_offset"]:
-            str_splt = self.config["time_step_offset"].split(":")
-            h = int(str_splt[0])
-            m = int(str_splt[1])
-            s = float(str_splt[2])
-            return timedelta(hours=h,minutes=m,seconds=s)
-        else:
-            return timedelta(0)
+        return self.plan.time_step_offset
 
     def get_area_of_interest(self):
-        aoi=[]
-        if self._validated_config("area_of_interest") is not None:
-            for s in self._validated_config("area_of_interest").replace(" ","").replace("),",");").split(";"):
-                splt = s.strip().split(",")
-                aoi.append(( float(splt[0][1:]), float(splt[1][:-1]) ))
-        return aoi
+        return list(self.plan.area_of_interest)
 
     get_aoi = get_area_of_interest
 
@@ -360,6 +661,23 @@ class GranuleFilterError(Exception):
         return repr(self.value)
 
 
+def _parse_duration(s, default=None):
+    """ parses a 'hh:mm:ss' config string into a timedelta """
+    if s:
+        str_splt = s.split(":")
+        h = int(str_splt[0])
+        m = int(str_splt[1])
+        sec = float(str_splt[2])
+        return timedelta(hours=h,minutes=m,seconds=sec)
+    else:
+        return default
+
+def _now_if_none(t):
+    """ datetime t, or the current time if t is None """
+    if t is None:
+        return datetime.now()
+    return t
+
 def _parser_server_string(s):
     host = s.split("@")[-1]
     user = s.split("@")[0].split(':')[0]
@@ -0,0 +1,128 @@
+from collections import OrderedDict
+from datetime import datetime
+from .file_name_parser import _prefix_index
+
+
+class GranuleFilterSet(object):
+    """
+    A set of granule filters, sharing file listings.
+    Routes each file name of a listing to the filters whose
+    source file name pattern matches it, so that a listing is
+    parsed once for all filters rather than once per filter.
+    Routed names are validated with the parse results of routing,
+    not parsed again.
+
+    Routing uses a combined index of the literal prefixes of all
+    filters' source patterns (including subset names), and only
+    then tries the compiled matcher of each candidate filter.
+    """
+    def __init__(self, granule_filters):
+        """
+        granule_filters is either a dict of granule filters,
+        as returned by get_granule_filters, or a list of filters,
+        which are then named by their config_name.
+        """
+        if hasattr(granule_filters, 'keys'):
+            self.filters = OrderedDict( (key, granule_filters[key]) for key in sorted(granule_filters.keys()) )
+        else:
+            self.filters = OrderedDict( (gf['config_name'], gf) for gf in granule_filters )
+
+        # combined literal prefix index of all source patterns
+        entries = []
+        for name in self.filters:
+            parser = self.filters[name].source_file_name_parser
+            if parser is not None:
+                entries += [ (x, name) for x, subset in parser.subset_table ]
+        self._prefix_index, self._prefix_lengths = _prefix_index(entries)
+
+    def __getitem__(self, name):
+        return self.filters[name]
+
+    def __iter__(self):
+        return iter(self.filters)
+
+    def __len__(self):
+        return len(self.filters)
+
+    def candidates(self, filepath):
+        """
+        Returns the names of filters whose source pattern
+        prefix matches filepath.
+        """
+        names = []
+        for n in self._prefix_lengths:
+            for x, name in self._prefix_index.get(filepath[:n], ()):
+                if name not in names:
+                    names.append(name)
+        return names
+
+    def route(self, filepaths, names=None):
+        """
+        Routes a listing of file paths to the filters whose source
+        file name pattern they match. If names is given, routing is
+        restricted to those filters.
+        Returns an OrderedDict of filter name -> list of file paths.
+        """
+        return self._route(filepaths, names=names)[0]
+
+    def _route(self, filepaths, names=None):
+        """
+        route, also returning the parse results of routed file paths,
+        as a dict of filter name -> dict of file path -> parse result.
+        """
+        routed = OrderedDict( (name, []) for name in self.filters if names is None or name in names )
+        parsed = dict( (name, {}) for name in routed )
+        for f in filepaths:
+            for name in self.candidates(f):
+                if name in routed:
+                    result = self.filters[name].source_file_name_parser.parse(f)
+                    if result is not None:
+                        routed[name].append(f)
+                        parsed[name][f] = result
+        return routed, parsed
+
+    def filter(self, filepaths, with_aoi=True, names=None):
+        """
+        Filters a listing of file paths through all filters
+        (or those named).
+        Returns an OrderedDict of filter name -> GranuleBiDict.
+        """
+        routed, parsed = self._route(filepaths, names=names)
+        return OrderedDict( (name, self.filters[name]._filter(routed[name], with_aoi=with_aoi,
+                                                              parsed=parsed[name]))
+                            for name in routed )
+
+    def list_source(self, t=None, with_aoi=True):
+        """
+        Lists the source directories of all filters, each distinct
+        server directory only once, and filters the listings.
+        t defaults to the current time.
+        Filters without a file access layer are skipped.
+        Returns an OrderedDict of filter name -> GranuleBiDict.
+        """
+        if t is None:
+            t = datetime.now()
+        # group filters sharing server
+        groups = OrderedDict()
+        for name in self.filters:
+            gf = self.filters[name]
+            if getattr(gf, 'file_access_layer', None) is None:
+                continue
+            key = (gf['protocol'], gf['server'])
+            groups.setdefault(key, []).append(name)
+
+        result = OrderedDict()
+        for key in groups:
+            names = groups[key]
+            file_access_layer = self.filters[names[0]].file_access_layer
+            # list each distinct directory once
+            directories = []
+            for name in names:
+                for d in self.filters[name].source_file_name_parser.directories(t = t):
+                    if d not in directories:
+                        directories.append(d)
+            filelist = []
+            for d in directories:
+                filelist += file_access_layer.list_source_directory(d)
+            result.update( self.filter(filelist, with_aoi=with_aoi, names=names) )
+        return result
@@ -0,0 +1,59 @@
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    A bounded, least recently used cache.
+    Once maxsize entries are held, the least recently used entry
+    is dropped to make room for a new one.
+    Cache hits and misses are counted in the hits and misses
+    attributes.
+    """
+    def __init__(self, maxsize=10000):
+        if maxsize < 1:
+            raise ValueError("LRUCache maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        """
+        Returns cached value of key, marking it as most recently used,
+        or default if not cached.
+        """
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        Caches value under key, evicting the least recently
+        used entry if the cache is full.
+        """
+        if key in self._data:
+            del self._data[key]
+        elif len(self._data) >= self.maxsize:
+            self._data.popitem(last=False)
+        self._data[key] = value
+
+    def clear(self):
+        """ Empties the cache and resets the hit and miss counters. """
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __str__(self):
+        return "LRUCache(size=%d, maxsize=%d, hits=%d, misses=%d)"%(len(self), self.maxsize,
+                                                                     self.hits, self.misses)
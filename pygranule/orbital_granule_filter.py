@@ -1,8 +1,11 @@
 
 
-from .granule_filter import GranuleFilter, GranuleFilterError
+from .granule_filter import GranuleFilter, GranuleFilterError, _parse_duration
 from .pyorbital_layer import PyOrbitalLayer
-from datetime import timedelta
+from .sampling_disk_cache import SamplingDiskCache
+from datetime import datetime, timedelta
+import multiprocessing
+import numpy as np
 
 class OrbitalGranuleFilter(GranuleFilter):
     
@@ -10,21 +13,181 @@ class OrbitalGranuleFilter(GranuleFilter):
 
     def __init__(self, input_config):
         GranuleFilter.__init__(self, input_config)
-        # instanciate orbital layer
-        aoi = self.get_aoi()
+        self.orbital_layer = self._orbital_layer()
+
+    def compile_plan(self):
+        """
+        Compiles the configuration into an immutable FilterPlan,
+        see GranuleFilter.compile_plan, and rebuilds the orbital layer
+        and the pass table horizon from it.  The orbital elements in
+        use are kept if the satellite has not changed.
+        """
+        plan = GranuleFilter.compile_plan(self)
+        # sampling looked up in a table of passes over this horizon, if set
+        self.pass_table_horizon = _parse_duration(self.config["pass_table_horizon"])
+        # the layer is first built in __init__, after the first compilation
+        old_layer = getattr(self, 'orbital_layer', None)
+        if old_layer is not None:
+            self.orbital_layer = self._orbital_layer()
+            if self.orbital_layer.sat == old_layer.sat:
+                self.orbital_layer.set_tle(*old_layer.tle_lines())
+        return plan
+
+    def _orbital_layer(self):
+        """
+        Returns an orbital layer set up from the configuration,
+        with the aoi and projection of the plan.
+        """
         sat = self.config["sat_name"]
         ins = self.config["instrument"]
-        self.orbital_layer = PyOrbitalLayer(aoi, sat, instrument=ins)
+        layer = PyOrbitalLayer(self.plan.area_of_interest, sat, instrument=ins,
+                               working_projection=self.plan.working_projection)
+        # persistent sampling cache, if set
+        if self.config["sampling_cache_path"] is not None:
+            layer.disk_cache = SamplingDiskCache(self.config["sampling_cache_path"])
+        # adaptive swath outlines within this tolerance (meters), if set
+        if self.config["outline_tolerance"] is not None:
+            layer.outline_tolerance = float(self.config["outline_tolerance"])
+        return layer
+
+    def _validation_epoch(self):
+        """
+        Cached validation verdicts depend on the orbital elements in use.
+        """
+        return self.orbital_layer.tle_epoch()
 
     def check_sampling_from_time(self, start, period=None):
         """
         Tests if granule at time step start samples (overlaps) target
         point / area of interest.
+        Verdicts are kept in the filter's sampling cache.
         """
         if period is None:
-            period = self.get_granule_duration().total_seconds()/60.0
-        
-        return self.orbital_layer.does_swath_sample_aoi(start,period)
+            period = self.plan.granule_duration.total_seconds()/60.0
+
+        key = (start, period, self._validation_epoch())
+        sampled = self.sampling_cache.get(key)
+        if sampled is None:
+            if self.pass_table_horizon is not None:
+                sampled = bool(self.orbital_layer.does_swath_sample_aoi_by_pass_table(start, period,
+                                                                                      self.pass_table_horizon))
+            else:
+                sampled = bool(self.orbital_layer.does_swath_sample_aoi(start,period))
+            self.sampling_cache.put(key, sampled)
+        return sampled
+
+    def check_sampling_from_times(self, times, period=None):
+        """
+        Batched check_sampling_from_time, for a sequence of granule
+        start times.  Uncached time stamps are tested together
+        (see OrbitalLayer.does_swaths_sample_aoi).
+        Returns a boolean array.
+        """
+        if period is None:
+            period = self.plan.granule_duration.total_seconds()/60.0
+
+        times = list(times)
+        epoch = self._validation_epoch()
+        sampled = np.zeros(len(times), dtype=bool)
+        todo = []
+        for i, t in enumerate(times):
+            cached = self.sampling_cache.get((t, period, epoch))
+            if cached is None:
+                todo.append(i)
+            else:
+                sampled[i] = cached
+
+        layer = self.orbital_layer
+        if self.pass_table_horizon is not None:
+            # look up in the pass table (in time order, so that it
+            # is recomputed as little as possible), batching the undecided
+            undecided = []
+            for i in sorted(todo, key=lambda i: times[i]):
+                verdict = layer.does_swath_sample_aoi_by_pass_table(times[i], period,
+                                                                   self.pass_table_horizon, exact=False)
+                if verdict is None:
+                    undecided.append(i)
+                else:
+                    sampled[i] = verdict
+        else:
+            undecided = todo
+        sampled[undecided] = layer.does_swaths_sample_aoi([ times[i] for i in undecided ], period)
+
+        for i in todo:
+            self.sampling_cache.put((times[i], period, epoch), bool(sampled[i]))
+        return sampled
+
+    def _sampling_verdicts(self, times, processes=None):
+        """
+        Evaluates check_sampling_from_time once for each distinct
+        time stamp in times, in a single batch (see check_sampling_from_times),
+        or sharing uncached time stamps out among worker processes
+        if processes is set (see filter).
+        Returns a dict of time stamp -> True or False.
+        """
+        if processes is None:
+            distinct = list(set(times))
+            return dict(zip(distinct, self.check_sampling_from_times(distinct).tolist()))
+
+        period = self.plan.granule_duration.total_seconds()/60.0
+        epoch = self._validation_epoch()
+        sampled = {}
+        todo = []
+        for t in times:
+            if t in sampled:
+                continue
+            sampled[t] = self.sampling_cache.get((t, period, epoch))
+            if sampled[t] is None:
+                todo.append(t)
+
+        for t, verdict in zip(todo, self._parallel_sampling(todo, period, processes)):
+            sampled[t] = verdict
+            self.sampling_cache.put((t, period, epoch), verdict)
+        return sampled
+
+    def _parallel_sampling(self, times, period, processes):
+        """
+        Evaluates does_swath_sample_aoi for a list of granule start times
+        in worker processes, each holding its own orbital layer rebuilt
+        from the area of interest, satellite, instrument and orbital
+        elements of this filter.  processes is either a number of
+        worker processes, or a pool / executor with a map method.
+        Returns a list of True or False, in order of times.
+        """
+        if len(times) == 0:
+            return []
+        if isinstance(processes, int):
+            if processes <= 1 or len(times) == 1:
+                return [ bool(self.orbital_layer.does_swath_sample_aoi(t, period)) for t in times ]
+            pool = multiprocessing.Pool(processes)
+            n_workers = processes
+        else:
+            pool = processes
+            n_workers = multiprocessing.cpu_count()
+
+        layer = self.orbital_layer
+        cache_path = None
+        if layer.disk_cache is not None:
+            cache_path = layer.disk_cache.path
+        layer_args = ( tuple( (float(x), float(y)) for x, y in zip(layer.aoi[0], layer.aoi[1]) ),
+                       layer.sat, layer.instrument, tuple(layer.tle_lines()), cache_path,
+                       layer.outline_tolerance, tuple(sorted(layer.working_projection.items())) )
+
+        # interleave time stamps among the tasks, so that the costly
+        # ones near an overpass are spread among the workers
+        n_tasks = min(len(times), 4*n_workers)
+        tasks = [ (layer_args, times[i::n_tasks], period) for i in range(n_tasks) ]
+        try:
+            results = pool.map(_sample_times_worker, tasks)
+        finally:
+            if pool is not processes:
+                pool.close()
+                pool.join()
+
+        verdicts = [None]*len(times)
+        for i, result in enumerate(results):
+            verdicts[i::n_tasks] = result
+        return verdicts
 
     def show(self, filepaths):
         """
@@ -54,12 +217,15 @@ class OrbitalGranuleFilter(GranuleFilter):
         Return result as list of GranuleBiDicts.
         Note: Opeartion does not pre-perform filtering.
         """
-        # make datetime filepath list
+        # make datetime filepath list, from a single parse of the listing
+        filepaths = list(filepaths)
+        times, codes, valid = self.source_file_name_parser.parse_many(filepaths)
+        offset = self.plan.time_stamp_offset
+        subset_tuples = self.source_file_name_parser.subset_tuples
         t_fp_pairs = []
-        for fp in filepaths:
-            # get time signature
-            t = self.time_from_filename(fp)
-            t_fp_pairs.append((t,fp))
+        for i in np.flatnonzero(valid):
+            t = times[i].astype(datetime)
+            t_fp_pairs.append((t+offset, filepaths[i], t, subset_tuples[codes[i]]))
         t_fp_pairs.sort()
         # break up
         dt = timedelta(minutes=self.orbital_layer.orbital_period()/4.0)
@@ -77,48 +243,119 @@ class OrbitalGranuleFilter(GranuleFilter):
                     t = t_fp_pairs[0][0]
        
                 if (t > mint) and (t < maxt):
-                    new_part.append(t_fp_pairs.pop(0)[1])                    
+                    new_part.append(t_fp_pairs.pop(0))
                 else:
                     parts.append(new_part)
                     break
         # insert into list of bidicts,
         bidicts = []
         for part in parts:
-            bidicts.append( self.translate(part) )
+            bidicts.append( self._translate_parsed([ x[1] for x in part ],
+                                                   [ x[2] for x in part ],
+                                                   [ x[3] for x in part ]) )
 
         # returned GranuleBiDict
         return bidicts
 
-    def complete(self, filepath, contiguous=True):
+    def complete(self, filepath, contiguous=True, processes=None):
         """
         Given a valid filepath, returns full set of filepaths 
         that complete this satellite pass, subsets and granules
         that intersect the AOI.
+        The granules of half an orbit either side are tested up front,
+        in one batch, or in parallel if processes is given (see filter).
+        """
+        times = self._pass_times(filepath, contiguous=contiguous, processes=processes)
+
+        # add full subset to each granule, one time range per contiguous run
+        dt = self.plan.time_step
+        full_sample = []
+        for t0, t1 in _contiguous_runs(times, dt):
+            full_sample.extend( self.source_file_name_parser.filenames_from_time_range(t0, t1+dt, dt) )
+
+        # return result as GranuleBiDict
+        return self.translate(full_sample)
+
+    def pass_coverage(self, filepath, contiguous=True, processes=None):
+        """
+        Given a valid filepath, returns the area of interest coverage
+        of each granule time step of this satellite pass (see complete),
+        as a time ordered list of (time, fraction, cumulative fraction)
+        tuples, computed in one batch (see OrbitalLayer.swaths_coverage).
+        The last cumulative fraction is the coverage of the whole pass.
+        """
+        times = self._pass_times(filepath, contiguous=contiguous, processes=processes)
+        period = self.plan.granule_duration.total_seconds()/60.0
+        fractions, cumulative = self.orbital_layer.swaths_coverage(times, period)
+        return zip(times, fractions.tolist(), cumulative.tolist())
+
+    def _pass_times(self, filepath, contiguous=True, processes=None):
+        """
+        Time ordered granule time steps of the satellite pass of
+        validated filepath, that intersect the AOI.
         """
         # make sure filepath is validated
         if self.validate( filepath ) is False:
             raise GranuleFilterError("Fill sampling requires a validated filepath")
 
-        # add full subset to pass
-        t = self.source_file_name_parser.time_from_filename(filepath)
-        full_sample = self.source_file_name_parser.filenames_from_time(t)
-
         # step outwards, recording granules that intersect AOI,
-        dt = self.get_time_step()
+        # the given granule is always part of the pass, stepping
+        # starts at it, so that if it does not sample the AOI
+        # a contiguous pass holds only the given granule
+        t = self.source_file_name_parser.time_from_filename(filepath)
+        dt = self.plan.time_step
+        times = set([t])
         # step 1/2 an orbit in either direction to look for pass granules
         n_steps = int( self.orbital_layer.orbital_period()/(dt.total_seconds()/60)/2.0 )
+        # test the granules of half an orbit either side in one batch
+        self._sampling_verdicts( [ t+i*dt for i in range(1-n_steps,n_steps) ],
+                                 processes=processes )
         # fwd fill
         for i in range(n_steps):
             if self.check_sampling_from_time(t+i*dt):
-                full_sample += self.source_file_name_parser.filenames_from_time(t+i*dt)
+                times.add(t+i*dt)
             elif contiguous:
                 break
         # bwd fill
         for i in range(n_steps):
             if self.check_sampling_from_time(t-i*dt):
-                full_sample += self.source_file_name_parser.filenames_from_time(t-i*dt)
+                times.add(t-i*dt)
             elif contiguous:
                 break
+        return sorted(times)
 
-        # return result as GranuleBiDict
-        return self.translate(full_sample)
+
+# orbital layers rebuilt in a worker process, by layer arguments
+_worker_layers = {}
+
+def _sample_times_worker(task):
+    """
+    Worker process function of OrbitalGranuleFilter._parallel_sampling.
+    task is a tuple of (layer arguments, granule start times, period).
+    """
+    layer_args, times, period = task
+    layer = _worker_layers.get(layer_args)
+    if layer is None:
+        aoi, sat, instrument, tle_lines, cache_path, outline_tolerance, working_projection = layer_args
+        layer = PyOrbitalLayer(aoi, sat, instrument=instrument, working_projection=working_projection)
+        layer.set_tle(*tle_lines)
+        layer.outline_tolerance = outline_tolerance
+        if cache_path is not None:
+            layer.disk_cache = SamplingDiskCache(cache_path)
+        _worker_layers[layer_args] = layer
+    # batched, so that results are stored in the disk cache in one transaction
+    return layer.does_swaths_sample_aoi(times, period).tolist()
+
+
+def _contiguous_runs(times, step):
+    """
+    Groups sorted time stamps into runs of consecutive steps.
+    Returns a list of (first, last) time stamp pairs.
+    """
+    runs = []
+    for t in times:
+        if runs and t - runs[-1][1] == step:
+            runs[-1][1] = t
+        else:
+            runs.append([t, t])
+    return [ tuple(x) for x in runs ]
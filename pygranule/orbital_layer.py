@@ -2,6 +2,15 @@ from datetime import datetime, timedelta
 import numpy as np
 from pyproj import Proj
 from shapely import geometry
+from shapely.prepared import prep
+try:
+    # array predicates, shapely >= 2.0
+    from shapely import intersects as _intersects_array
+except ImportError:
+    _intersects_array = None
+from .sampling_disk_cache import sampling_keys
+from .pass_table import PassTable
+from .swath_ribbon import SwathRibbon
 
 from abc import ABCMeta, abstractmethod
 
@@ -20,30 +29,75 @@ class OrbitalLayer(object):
     """
     __metaclass__ = ABCMeta
 
-    instrument_info_db = {'AVHRR':{'scan_steps':2048},
-                          'MODIS':{},
-                          'VIIRS':{}}
+    # half_swath_width: ground distance in meters from the sub satellite
+    # track to the swath edge, rounded up
+    instrument_info_db = {'AVHRR':{'scan_steps':2048, 'half_swath_width':1.5e6},
+                          'MODIS':{'half_swath_width':1.2e6},
+                          'VIIRS':{'half_swath_width':1.6e6}}
     earth_radius = 6.37e6
+    max_swath_ribbons = 4
     proj_out_of_bounds_value = 1.0e30
-
-    def __init__(self, aoi, sat, instrument="AVHRR"):
+    # swath outline tolerance in meters (working projection), None
+    # for outlines at fixed time steps, see swath_working_projection
+    outline_tolerance = None
+    # swaths shorter than this (minutes) are outlined within the tolerance
+    # at the smallest adaptive step, adaptive refinement only pays off
+    # on longer swaths
+    adaptive_outline_min_period = 15.0
+
+    def __init__(self, aoi, sat, instrument="AVHRR", working_projection=None):
         self.aoi = np.array([ [x for (x,y) in aoi],[y for (x,y) in aoi] ])
         self.sat = sat
         self.instrument = instrument
         self.instrument_info = self.instrument_info_db[instrument]
 
-        # init working projection for aoi/observation polygons
+        # init working projection for aoi/observation polygons,
+        # as given (e.g. by a FilterPlan), or centered on the aoi
         clon,clat = self.aoi_center()
-        self.working_projection = {'proj':'ortho', 'lon_0':clon, 'lat_0':clat}
+        if working_projection is None:
+            self.working_projection = {'proj':'ortho', 'lon_0':clon, 'lat_0':clat}
+        else:
+            self.working_projection = dict(working_projection)
         self.proj = Proj(**self.working_projection)
 
+        # aoi in working projection, built once, prepared for
+        # repeated predicates, and its bounds for envelope rejection
+        self._aoi_polygon = self._project_aoi_polygon()
+        self.aoi_prepared = prep(self._aoi_polygon)
+        self.aoi_bounds = self._aoi_polygon.bounds
+
+        # optional persistent cache of sampling results (SamplingDiskCache)
+        self.disk_cache = None
+
+        # table of passes over the aoi (PassTable), see does_swath_sample_aoi_by_pass_table
+        self.pass_table = None
+
+        # recently computed swath ribbons (SwathRibbon), see swath_working_projection
+        self.swath_ribbons = []
+
+        # bounding spherical cap of the aoi, (center lon, center lat, radius in meters)
+        # padded by 10% for edges bulging beyond the vertices
+        radius = _great_circle_distance(clon, clat, self.aoi[0], self.aoi[1]).max()
+        self.aoi_cap = (clon, clat, 1.1*radius)
+
     @abstractmethod
+    def transits(self, start, end, resolution=100):
+        """
+        All transit times relative to center of aoi, within (start, end].
+        Search resolution defined by subdivision of orbital period.
+        """
+        pass
+
     def next_transit(self, start=datetime.now(), resolution=100):
         """
         Next transit time relative to center of aoi.
-        Search resolution accuracy defined by subdivision of orbital period.
+        Search resolution defined by subdivision of orbital period.
+        A transit within half a search step of start is not accepted,
+        so that calls may be chained from the previous transit.
         """
-        pass
+        skip = timedelta(minutes=0.5*self.orbital_period()/resolution)
+        end = start + timedelta(minutes=1.2*self.orbital_period())
+        return self.transits(start + skip, end, resolution)[0]
 
     def next_sampling(self, start=datetime.now(), resolution=100, search_limit=timedelta(hours=30)):
 	"""
@@ -51,22 +105,16 @@ class OrbitalLayer(object):
 	Returns transit time relative to center of aoi and fraction of aoi area
 	sampled by the instrument swath.
         """
-        # next transit
         quarter_period = timedelta(minutes=self.orbital_period()/4.0)
-
-        t = self.next_transit(start,resolution)
-        Dt = t - start
-        f = self.intersect_fraction(t-quarter_period, 2.0*quarter_period.total_seconds()/60.0)
-        if f > 0.0:
-            return t, f
-        else:
-            while Dt < search_limit:
-                t = self.next_transit(t,resolution)
-                Dt = t - start
-                f = self.intersect_fraction(t-quarter_period, 2.0*quarter_period.total_seconds()/60.0)
-                if f > 0.0:
-                    return t, f
-            raise Exception('AOI Sampling exceeded search limit')
+        # all transits of the search window at once
+        end = start + search_limit + timedelta(minutes=1.2*self.orbital_period())
+        for t in self.transits(start, end, resolution):
+            f = self.intersect_fraction(t-quarter_period, 2.0*quarter_period.total_seconds()/60.0)
+            if f > 0.0:
+                return t, f
+            if t - start >= search_limit:
+                break
+        raise Exception('AOI Sampling exceeded search limit')
 
     @abstractmethod
     def orbital_period(self):
@@ -88,25 +136,21 @@ class OrbitalLayer(object):
         # 100th step of orbit should be sufficient resolution for resulting polygon
         # equivalent ot 1m AVHRR granule
         t_step = self.orbital_period()/100.0
-        t_steps = np.arange(0.0, period+t_step, t_step)
-
-        scans_lon = []
-        scans_lat = []
-
-        for dt in t_steps:
-            t = start + timedelta(minutes=dt)
-            pos_time = self.scan_line_lonlats(t)
-            scans_lon.append( pos_time[0] )
-            scans_lat.append( pos_time[1] )
-        scans_lon = np.array(scans_lon)
-        scans_lat = np.array(scans_lat)
+        if self.outline_tolerance is None:
+            t_steps = np.arange(0.0, period+t_step, t_step)
+            scans_lon, scans_lat = self.scan_lines_lonlats([ start + timedelta(minutes=dt) for dt in t_steps ])
+        else:
+            def scan_lines(offsets):
+                lons, lats = self.scan_lines_lonlats([ start + timedelta(minutes=dt) for dt in offsets ])
+                xs, ys = self.proj(lons, lats)
+                return [np.asarray(xs), np.asarray(ys), lons, lats]
+            t_steps, (xs, ys, scans_lon, scans_lat) = self._tolerance_scan_lines(scan_lines, period)
 
         # pick out perimeter of swaths
-        lons = scans_lon[0,:].tolist() + (scans_lon[1:-1,-1].tolist()) \
-            + (scans_lon[-1,:])[::-1].tolist() + (scans_lon[1:-1,0])[::-1].tolist()
-
-        lats = scans_lat[0,:].tolist() + scans_lat[1:-1,-1].tolist() \
-            + (scans_lat[-1,:])[::-1].tolist() + (scans_lat[1:-1,0])[::-1].tolist()
+        lons = np.concatenate((scans_lon[0,:], scans_lon[1:-1,-1],
+                               scans_lon[-1,::-1], scans_lon[-2:0:-1,0]))
+        lats = np.concatenate((scans_lat[0,:], scans_lat[1:-1,-1],
+                               scans_lat[-1,::-1], scans_lat[-2:0:-1,0]))
 
         return np.array((lons,lats))
 
@@ -118,6 +162,16 @@ class OrbitalLayer(object):
         """
         pass
 
+    def scan_lines_lonlats(self, times):
+        """
+        Returns the instrument scan lines starting at each of datetimes times,
+        as an array of shape (2, number of lines, pixels per line).
+        Orbital layers should override this with a single
+        vectorized propagation of all lines.
+        """
+        scans = [ np.reshape(self.scan_line_lonlats(t), (2,-1)) for t in times ]
+        return np.array(scans).transpose((1,0,2))
+
     def scan_line_working_projection(self, t):
         """
         Returns a single instrument scan line sarting at datetime t
@@ -131,56 +185,101 @@ class OrbitalLayer(object):
         Returns the coordinate outline of the instrument swath in
         working projection coordinates.  Out of map projection bound 
         coordinates are handled by splitting up the outline into a list.
+
+        Scan lines are taken at 1000th steps of the orbit, or, if
+        outline_tolerance (meters) is set, at adaptive steps, refined
+        only where the outline deviates more than the tolerance from
+        straight edges between scan lines.  Adaptive steps are only taken
+        for swaths of adaptive_outline_min_period or longer, shorter ones
+        end exactly at period at even steps of at most 1000th of the orbit.
         """
         # default period is 1 minute long granule
         if period is None:
             period = 1.0
 
-        # 100th step of orbit should be sufficient resolution for resulting polygon
-        # equivalent ot 1m AVHRR granule
+        # cut scan lines from the swath ribbon of the pass
+        ribbon = self.swath_ribbon(start, self._outline_end(start, period))
+        return self._ribbon_outline(ribbon, start, period)
+
+    def _outline_steps(self, period):
+        """
+        Fixed scan line offsets (minutes) of a swath outline period minutes long.
+        """
+        # 1000th step of orbit should be sufficient resolution for resulting polygon
         t_step = self.orbital_period()/1000.0
-        t_steps = np.arange(0.0, period+t_step, t_step)
-
-        # fetch all scan lines and index segments
-        def has_valid_xy(A):
-            return ((A[0] != self.proj_out_of_bounds_value) & (A[1] != self.proj_out_of_bounds_value)).any()
-
-        def valid_xys(A):
-            sel = (A[0] != self.proj_out_of_bounds_value) & (A[1] != self.proj_out_of_bounds_value)
-            return A[:,sel]
-
-        scans = []
-        segment_idx = []
-        count = 0
-        idx = -1
-        for dt in t_steps:
-            t = start + timedelta(minutes=dt)
-            pos = self.scan_line_working_projection(t)
-            if has_valid_xy(pos):
-                scans.append( valid_xys(pos) )
-                if idx < 0: #begin segment
-                    idx = count
-                count += 1
-            elif idx > -1:  #end segment
-                segment_idx.append((idx,count-1))
-                idx = -1
-        if (pos < self.proj_out_of_bounds_value).any():
-            segment_idx.append((idx,count-1))
-
-        # pick out perimeters of segments (this is fast / above is bottleneck)
-        segments = []
-        for s in segment_idx:
-            a,b = s
-            xs = scans[a][0].tolist()
-            ys = scans[a][1].tolist()
-            for i in range(a+1,b):
-                xs = scans[i][0,0:1].tolist() + xs + scans[i][0,-1:].tolist()
-                ys = scans[i][1,0:1].tolist() + ys + scans[i][1,-1:].tolist()
-            xs = xs + scans[b][0,::-1].tolist()
-            ys = ys + scans[b][1,::-1].tolist()
-            segments.append( np.array((xs,ys)) )
-
-        return segments
+        return np.arange(0.0, period+t_step, t_step)
+
+    def _outline_end(self, start, period):
+        """
+        Datetime of the last scan line of the outline of a swath
+        from datetime start, period minutes long.
+        """
+        if self.outline_tolerance is None:
+            return start + timedelta(minutes=self._outline_steps(period)[-1])
+        return start + timedelta(minutes=period)
+
+    def _ribbon_outline(self, ribbon, start, period):
+        """
+        Outline segments (see swath_working_projection) of the swath from
+        datetime start, period minutes long, cut from a swath ribbon
+        covering it.  All swath outlines in working projection coordinates
+        are built here, at fixed steps, or at adaptive steps within
+        outline_tolerance if it is set.
+        """
+        if self.outline_tolerance is None:
+            xs, ys = ribbon.scan_lines(start, self._outline_steps(period))
+        else:
+            offsets, (xs, ys) = self._tolerance_scan_lines(
+                lambda offsets: ribbon.scan_lines(start, offsets), period)
+        return _outline_segments(xs, ys, self.proj_out_of_bounds_value)
+
+    def _tolerance_scan_lines(self, scan_lines, period):
+        """
+        Scan lines of a swath outline within outline_tolerance, see
+        _adaptive_scan_lines.  Swaths shorter than adaptive_outline_min_period
+        take the scan lines at even steps no longer than the smallest
+        adaptive step (1000th of the orbit) instead, as fast as refining
+        them and at least as accurate.
+        """
+        min_step = self.orbital_period()/1000.0
+        if period < self.adaptive_outline_min_period:
+            n = max(1, int(np.ceil(period/min_step - 1.0e-9)))
+            offsets = np.linspace(0.0, period, n+1)
+            return offsets, scan_lines(offsets)
+        return _adaptive_scan_lines(scan_lines, period, self.orbital_period()/100.0, min_step,
+                                    self.outline_tolerance, self.proj_out_of_bounds_value)
+
+    def swath_ribbon(self, start, end):
+        """
+        Returns a swath ribbon covering datetimes start to end, from the
+        recently computed ribbons, or else a newly computed ribbon
+        spanning at least a quarter orbit (a pass) from start.
+        Ribbons are dropped if the two line elements have changed.
+        """
+        tle_lines = tuple(self.tle_lines())
+        self.swath_ribbons = [ x for x in self.swath_ribbons if x.tle_lines == tle_lines ]
+        for ribbon in self.swath_ribbons:
+            if ribbon.covers(start, end):
+                return ribbon
+        step = timedelta(minutes=self.orbital_period()/1000.0)
+        span = max(end - start, timedelta(minutes=self.orbital_period()/4.0))
+        ribbon = self.compute_swath_ribbon(start - step, start + span + step)
+        self.swath_ribbons = [ribbon] + self.swath_ribbons[:self.max_swath_ribbons-1]
+        return ribbon
+
+    def compute_swath_ribbon(self, start, end):
+        """
+        Computes the swath ribbon from datetime start to end, with
+        scan lines at 1000th steps of the orbit, propagated and
+        projected in single calls.
+        """
+        step = timedelta(minutes=self.orbital_period()/1000.0)
+        n = int(np.ceil((end - start).total_seconds()/step.total_seconds()))
+        times = [ start + k*step for k in range(n+1) ]
+        lons, lats = self.scan_lines_lonlats(times)
+        xs, ys = self.proj(lons, lats)
+        return SwathRibbon(start, step, np.asarray(xs), np.asarray(ys),
+                           tuple(self.tle_lines()), self.proj_out_of_bounds_value)
 
     def intersect_polygon(self, start, period=None):
         """
@@ -188,7 +287,7 @@ class OrbitalLayer(object):
         with the area of interest and the instrument swath sampled
         at datetime start for period number of minutes.
         """
-        swath = self.swath_polygon(start, period)
+        swath = _valid_polygon(self.swath_polygon(start, period))
         aoi = self.aoi_polygon()
         return aoi.intersection(swath)
 
@@ -197,43 +296,307 @@ class OrbitalLayer(object):
         Returns the fractional area of the area of interest, sampled by the 
         instrument swath starting at datetime 'start' for a 'period' number of minutes.
         """
-        swath = self.swath_polygon(start, period)
-        aoi = self.aoi_polygon()
-        intersect = aoi.intersection(swath)
-        return intersect.area/aoi.area
+        key = self._disk_cache_key('fraction', start, period)
+        if key is not None:
+            cached = self.disk_cache.get(key)
+            if cached is not None:
+                return cached
+        if self.could_swath_sample_aoi(start, period):
+            swath = _valid_polygon(self.swath_polygon(start, period))
+            aoi = self.aoi_polygon()
+            intersect = aoi.intersection(swath)
+            fraction = intersect.area/aoi.area
+        else:
+            fraction = 0.0
+        if key is not None:
+            self.disk_cache.put(key, fraction)
+        return fraction
+
+    def swaths_coverage(self, starts, period=None):
+        """
+        Area of interest coverage of a sequence of swaths (granules),
+        starting at datetimes starts, each period minutes long.
+        All outlines are cut from the shared swath ribbon of the pass.
+        Returns two arrays, the fraction of the aoi sampled by each swath,
+        and the cumulative fraction sampled by the swaths up to and
+        including each one, in order of starts.
+        """
+        if period is None:
+            period = 1.0
+        starts = list(starts)
+        fractions = np.zeros(len(starts))
+        cumulative = np.zeros(len(starts))
+        if len(starts) == 0:
+            return fractions, cumulative
+
+        ribbon = self.swath_ribbon(min(starts), self._outline_end(max(starts), period))
+        aoi = self._aoi_polygon
+        covered = geometry.Polygon()
+        for i, t in enumerate(starts):
+            swath = _valid_polygon(_segments_polygon(self._ribbon_outline(ribbon, t, period)))
+            if self._samples_aoi(swath):
+                intersect = aoi.intersection(swath)
+                covered = covered.union(intersect)
+                if aoi.area > 0.0:
+                    fractions[i] = intersect.area/aoi.area
+                else:
+                    # point or line aoi, sampled or not
+                    fractions[i] = 1.0
+            if aoi.area > 0.0:
+                cumulative[i] = covered.area/aoi.area
+            else:
+                cumulative[i] = float(not covered.is_empty)
+        if self.disk_cache is not None:
+            # fractions as by intersect_fraction
+            self.disk_cache.put_many(zip(self._disk_cache_keys('fraction', starts, period), fractions))
+        return fractions, cumulative
 
     def does_swath_sample_aoi(self, start, period=None):
         """
         Check if swath starting at time 'start' samples (overlaps)
         the area of interest.
         """
-        swath = self.swath_polygon(start, period)
-        aoi = self.aoi_polygon()
-        return swath.intersects(aoi)
+        key = self._disk_cache_key('sample', start, period)
+        if key is not None:
+            cached = self.disk_cache.get(key)
+            if cached is not None:
+                return bool(cached)
+        if self.could_swath_sample_aoi(start, period):
+            sampled = self._samples_aoi(self.swath_polygon(start, period))
+        else:
+            sampled = False
+        if key is not None:
+            self.disk_cache.put(key, sampled)
+        return sampled
         #return aoi.intersection(swath).area > 0.0
         # using area intersect because overlaps fails 
         # for small poly or if swath line does not cross (need to read pyshapely manual)
         #return swath.overlaps(aoi)
 
+    def does_swaths_sample_aoi(self, starts, period=None):
+        """
+        Batched does_swath_sample_aoi, for a sequence of swath start
+        datetimes.  Starts are pre-tested all at once, the remaining
+        swath outlines are cut from swath ribbons computed once per
+        pass, and tested against the aoi with array predicates where
+        available (shapely >= 2.0).
+        Returns a boolean array.
+        """
+        if period is None:
+            period = 1.0
+        starts = list(starts)
+        sampled = np.zeros(len(starts), dtype=bool)
+        if len(starts) == 0:
+            return sampled
+
+        # persistent cache
+        keys = self._disk_cache_keys('sample', starts, period)
+        todo = np.ones(len(starts), dtype=bool)
+        if self.disk_cache is not None:
+            for i, cached in enumerate(self.disk_cache.get_many(keys)):
+                if cached is not None:
+                    sampled[i] = bool(cached)
+                    todo[i] = False
+        todo_idx = np.flatnonzero(todo)
+
+        # pre-test, in time order for ribbon reuse
+        could = self.could_swaths_sample_aoi([ starts[i] for i in todo_idx ], period)
+        candidates = sorted( todo_idx[could], key=lambda i: starts[i] )
+
+        swaths = []
+        for i in candidates:
+            ribbon = self.swath_ribbon(starts[i], self._outline_end(starts[i], period))
+            swaths.append( _segments_polygon(self._ribbon_outline(ribbon, starts[i], period)) )
+        if _intersects_array is not None:
+            candidates_sampled = _intersects_array(np.array(swaths, dtype=object), self._aoi_polygon)
+        else:
+            candidates_sampled = [ self._samples_aoi(x) for x in swaths ]
+        sampled[candidates] = candidates_sampled
+
+        if self.disk_cache is not None:
+            self.disk_cache.put_many([ (keys[i], sampled[i]) for i in todo_idx ])
+        return sampled
+
+    def could_swaths_sample_aoi(self, starts, period=None):
+        """
+        Batched could_swath_sample_aoi, for a sequence of swath start
+        datetimes, with a single sub satellite track call.
+        Returns a boolean array.
+        """
+        if period is None:
+            period = 1.0
+        starts = list(starts)
+        if len(starts) == 0:
+            return np.zeros(0, dtype=bool)
+        ends = [ t + timedelta(minutes=period) for t in starts ]
+        lons, lats = self.sub_satellite_lonlats(starts + ends)
+        clon, clat, radius = self.aoi_cap
+        d = _great_circle_distance(clon, clat, lons, lats)
+        d = np.minimum(d[:len(starts)], d[len(starts):])
+        return d <= self._sampling_reach(period)
+
+    def could_swath_sample_aoi(self, start, period=None):
+        """
+        Cheap, conservative pre-test of does_swath_sample_aoi, comparing
+        the sub satellite track at the granule end points with the
+        bounding cap of the aoi, padded by the instrument half swath width.
+        Returns False only if the swath certainly misses the aoi.
+        """
+        if period is None:
+            period = 1.0
+        lons, lats = self.sub_satellite_lonlats([start, start + timedelta(minutes=period)])
+        clon, clat, radius = self.aoi_cap
+        d = _great_circle_distance(clon, clat, lons, lats).min()
+        return d <= self._sampling_reach(period)
+
+    def _sampling_reach(self, period):
+        """
+        Distance from the aoi cap center, beyond which the sub satellite
+        track at both end points of a granule of period minutes
+        certainly leaves the swath clear of the aoi.
+        """
+        # ground track length, with margin for the extra outline
+        # scan line and the rotation of the Earth
+        orbital_period = self.orbital_period()
+        track_length = 1.1*(period + orbital_period/500.0)/orbital_period*2.0*np.pi*self.earth_radius
+        # every point on the track is within half the track length of an end point
+        half_swath = self.instrument_info.get('half_swath_width', 1.6e6)
+        return self.aoi_cap[2] + half_swath + track_length/2.0
+
+    def compute_pass_table(self, start, end):
+        """
+        Computes the table of passes over the aoi between datetimes
+        start and end (see PassTable).  The window is divided into
+        cells of one swath scan line step, tested all at once with the
+        conservative pre-test of could_swath_sample_aoi, and then with
+        the swath geometry of each remaining cell, from a single batch
+        of scan lines per run of candidate cells.
+        """
+        cell = self.orbital_period()/1000.0
+        n = int(np.ceil((end - start).total_seconds()/60.0/cell))
+        times = [ start + timedelta(minutes=k*cell) for k in range(n+1) ]
+
+        # pre-test all cells at once
+        clon, clat, radius = self.aoi_cap
+        lons, lats = self.sub_satellite_lonlats(times)
+        d = _great_circle_distance(clon, clat, lons, lats)
+        could = np.minimum(d[:-1], d[1:]) <= self._sampling_reach(cell)
+
+        # swath geometry of candidate cells
+        sampled = np.zeros(n, dtype=bool)
+        for a, b in _true_runs(could):
+            ribbon = self.compute_swath_ribbon(times[a], times[b+1])
+            for k in range(a, b+1):
+                segments = self._ribbon_outline(ribbon, times[k], cell)
+                sampled[k] = self._samples_aoi(_segments_polygon(segments))
+
+        passes = []
+        for a, b in _true_runs(sampled):
+            enter, exit = times[a], times[b+1]
+            fraction = self.intersect_fraction(enter, (exit - enter).total_seconds()/60.0)
+            passes.append((enter, exit, fraction))
+        return PassTable(start, times[-1], timedelta(minutes=cell), passes, tuple(self.tle_lines()))
+
+    def _extend_pass_table(self, table, start, end):
+        """
+        The pass table extended to cover datetimes start to end.  Only
+        the window beyond the table is computed, overlapping it by a
+        quarter orbit, so that passes cut at the old table edge
+        are joined with their part in the extension.
+        """
+        overlap = timedelta(minutes=self.orbital_period()/4.0)
+        passes = list(table.passes)
+        if start < table.start:
+            passes += self.compute_pass_table(start, table.start + overlap).passes
+        if end > table.end:
+            extension = self.compute_pass_table(table.end - overlap, end)
+            passes += extension.passes
+            end = extension.end
+
+        # join passes found in both tables
+        joined = []
+        for enter, exit, fraction in sorted(passes):
+            if joined and enter <= joined[-1][1] + table.cell:
+                last_enter, last_exit, last_fraction = joined[-1]
+                if exit > last_exit:
+                    last_fraction = self.intersect_fraction(last_enter, (exit - last_enter).total_seconds()/60.0)
+                    last_exit = exit
+                joined[-1] = (last_enter, last_exit, last_fraction)
+            else:
+                joined.append((enter, exit, fraction))
+        return PassTable(min(start, table.start), max(end, table.end), table.cell, joined, table.tle_lines)
+
+    def does_swath_sample_aoi_by_pass_table(self, start, period=None, horizon=timedelta(days=1), exact=True):
+        """
+        As does_swath_sample_aoi, but looked up in the pass table,
+        with exact swath geometry only near pass edges (or None
+        returned there, if not exact).
+        The pass table is computed from start over the horizon, or
+        extended by the horizon, backward or forward, when it does not
+        cover a granule within the horizon of it.  It is recomputed
+        when the two line elements have changed.
+        """
+        if period is None:
+            period = 1.0
+        end = start + timedelta(minutes=period)
+        table = self.pass_table
+        if table is not None and table.tle_lines != tuple(self.tle_lines()):
+            table = None
+        if table is None or not table.covers(start, end):
+            margin = timedelta(minutes=self.orbital_period()/100.0)
+            if table is not None and table.start - horizon <= start and end <= table.end + horizon:
+                if start < table.start + table.cell:
+                    table = self._extend_pass_table(table, min(start - margin, table.start - horizon), table.end)
+                else:
+                    table = self._extend_pass_table(table, table.start, max(end + margin, table.end + horizon))
+            else:
+                table = self.compute_pass_table(start - margin, max(start + horizon, end) + margin)
+            self.pass_table = table
+        sampled = table.lookup(start, end)
+        if sampled is None and exact:
+            sampled = self.does_swath_sample_aoi(start, period)
+        return sampled
+
+    def _disk_cache_key(self, kind, start, period):
+        """ disk cache key of a sampling result, None if no disk cache is set """
+        return self._disk_cache_keys(kind, [start], period)[0]
+
+    def _disk_cache_keys(self, kind, starts, period):
+        """ disk cache keys of sampling results of starts, Nones if no disk cache is set """
+        if self.disk_cache is None:
+            return [None]*len(starts)
+        if period is None:
+            period = 1.0
+        if self.outline_tolerance is not None:
+            # results of adaptive outlines are cached apart
+            kind = "%s:%r"%(kind, float(self.outline_tolerance))
+        return sampling_keys(kind, self.sat, self.tle_lines(), self.instrument, self.aoi, starts, period)
+
     def swath_polygon(self, start, period=None):
         segments = self.swath_working_projection(start,period=period)
-        try:
-            if len(segments) == 0:
-                # empty polygon
-                return geometry.Polygon()
-            elif len(segments) == 1:
-                return geometry.Polygon(segments[0].transpose().tolist())
-            else:
-                P = geometry.Polygon(segments[0].transpose().tolist())
-                for i in range(1,len(segments)):
-                    P = P.union( geometry.Polygon(
-                            segments[i].transpose().tolist()) )
-            return P
-        except ValueError:
-            # empty polygon if invalid polygon created
-            return geometry.Polygon()
+        return _segments_polygon(segments)
+
+    def _samples_aoi(self, swath):
+        """
+        True if swath polygon intersects the aoi, rejecting
+        swaths clear of the aoi envelope first.
+        """
+        if swath.is_empty:
+            return False
+        minx, miny, maxx, maxy = swath.bounds
+        aoi_minx, aoi_miny, aoi_maxx, aoi_maxy = self.aoi_bounds
+        if minx > aoi_maxx or maxx < aoi_minx or miny > aoi_maxy or maxy < aoi_miny:
+            return False
+        return self.aoi_prepared.intersects(swath)
 
     def aoi_polygon(self):
+        """
+        The aoi as a shapely geometry in working projection coordinates.
+        Built once, at construction.
+        """
+        return self._aoi_polygon
+
+    def _project_aoi_polygon(self):
         xys = np.array(self.proj(*self.aoi))
         coords = xys.transpose().tolist()
         if len(coords) > 2:
@@ -367,4 +730,183 @@ class OrbitalLayer(object):
         Use to apply a particular two line element.
         """
         pass
- 
+
+    @abstractmethod
+    def sub_satellite_lonlats(self, times):
+        """
+        Returns sub satellite point longitudes and latitudes (arrays)
+        for a sequence of datetimes.
+        """
+        pass
+
+    @abstractmethod
+    def tle_lines(self):
+        """
+        The two line element in use, as a tuple of two strings.
+        """
+        pass
+
+    @abstractmethod
+    def tle_epoch(self):
+        """
+        Epoch of the two line element in use.
+        """
+        pass
+
+
+def _outline_segments(xs, ys, out_of_bounds_value):
+    """
+    Outlines of the runs of consecutive scan lines with valid
+    (in map projection bounds) coordinates. xs and ys are arrays of
+    shape (scan lines, pixels).  Out of bounds pixels are dropped
+    from the first and last scan line of a run, and the outline
+    sides follow the outermost valid pixels of the scan lines between.
+    Returns a list of (2, N) coordinate arrays, one per run.
+    """
+    valid = (xs != out_of_bounds_value) & (ys != out_of_bounds_value)
+    line_valid = valid.any(axis=1)
+    # first and last valid pixel of each scan line
+    n_pixels = valid.shape[1]
+    first = valid.argmax(axis=1)
+    last = n_pixels - 1 - valid[:,::-1].argmax(axis=1)
+
+    # runs of valid scan lines
+    segments = []
+    for a, b in _true_runs(line_valid):
+        mid = np.arange(a+1, b)
+        outline_x = np.concatenate((xs[mid,first[mid]][::-1], xs[a][valid[a]],
+                                    xs[mid,last[mid]], xs[b][valid[b]][::-1]))
+        outline_y = np.concatenate((ys[mid,first[mid]][::-1], ys[a][valid[a]],
+                                    ys[mid,last[mid]], ys[b][valid[b]][::-1]))
+        segments.append( np.array((outline_x,outline_y)) )
+    return segments
+
+
+def _adaptive_scan_lines(scan_lines, period, step, min_step, tolerance, out_of_bounds_value):
+    """
+    Scan lines of a swath outline, at time offsets (minutes) from 0 to period,
+    refined from an initial step until the swath edges (outer pixels) at the
+    middle of each interval lie within tolerance (meters) of the straight
+    edge between the interval scan lines, or the interval is min_step short.
+    Intervals where scan lines go out of map projection bounds are
+    refined down to min_step.
+
+    The deviation falls with the square of the interval length, so
+    failing intervals are split into sqrt(deviation/tolerance) parts at
+    once, and most outlines take one or two refinements.  Each refinement is one
+    scan_lines call, for the new scan lines and the middles of the
+    new intervals together.
+
+    scan_lines(offsets) returns a list of arrays of shape (lines, pixels),
+    the first two being the x, y working projection coordinates in meters.
+    Returns the offsets and the list of scan line arrays at the offsets.
+    """
+    n = max(1, int(np.ceil(period/step - 1.0e-9)))
+    offsets = np.linspace(0.0, period, n+1)
+    # interval ends and middles, in one batch
+    batch = scan_lines(np.linspace(0.0, period, 2*n+1))
+    lines = [ x[::2] for x in batch ]
+    mid_lines = [ x[1::2] for x in batch ]
+    pending = np.arange(n)
+    while len(pending) > 0:
+        deviation = _outline_deviation(lines[0][pending], lines[1][pending], mid_lines[0], mid_lines[1],
+                                       lines[0][pending+1], lines[1][pending+1], out_of_bounds_value)
+        length = offsets[pending+1] - offsets[pending]
+        split = (deviation > tolerance) & (length > min_step*(1.0 + 1.0e-9))
+        if not split.any():
+            break
+        i, length, deviation = pending[split], length[split], deviation[split]
+        # parts no longer than min_step, allowing for rounding of the offsets
+        max_parts = np.maximum(2, np.ceil(length/min_step*(1.0 + 1.0e-9)))
+        finite = np.isfinite(deviation)
+        parts = np.where(finite, np.ceil(np.sqrt(np.where(finite, deviation, 0.0)/tolerance)), max_parts)
+        parts = np.clip(parts, 2, max_parts).astype(int)
+
+        # new scan lines (even m) and new interval middles (odd m), in one batch
+        m = np.concatenate([ np.arange(1, 2*k) for k in parts ])
+        owner = np.repeat(np.arange(len(i)), 2*parts-1)
+        new_offsets = offsets[i][owner] + m*length[owner]/(2.0*parts[owner])
+        batch = scan_lines(new_offsets)
+        node = m%2 == 0
+        at = np.repeat(i+1, parts-1)
+        offsets = np.insert(offsets, at, new_offsets[node])
+        lines = [ np.insert(x, at, y[node], axis=0) for x, y in zip(lines, batch) ]
+        mid_lines = [ y[~node] for y in batch ]
+        # the new intervals, at their indexes after the insertion
+        first = i + np.concatenate(([0], np.cumsum(parts-1)[:-1]))
+        pending = np.repeat(first, parts) + np.concatenate([ np.arange(k) for k in parts ])
+    return offsets, lines
+
+
+def _outline_deviation(xa, ya, xm, ym, xb, yb, out_of_bounds_value):
+    """
+    Distance from the outer pixels of scan lines m to the straight
+    edges between the outer pixels of scan lines a and b, the larger of
+    both swath sides.  Infinite where the lines are partly out of map
+    projection bounds, zero where all are out of bounds.
+    """
+    deviation = np.zeros(len(xa))
+    for p in (0, -1):
+        ax, ay, mx, my, bx, by = xa[:,p], ya[:,p], xm[:,p], ym[:,p], xb[:,p], yb[:,p]
+        dx, dy = bx - ax, by - ay
+        d2 = dx**2 + dy**2
+        u = np.clip(((mx - ax)*dx + (my - ay)*dy)/np.where(d2 > 0.0, d2, 1.0), 0.0, 1.0)
+        deviation = np.maximum(deviation, np.hypot(ax + u*dx - mx, ay + u*dy - my))
+    invalid = [ (x == out_of_bounds_value) | (y == out_of_bounds_value)
+                for x, y in ((xa, ya), (xm, ym), (xb, yb)) ]
+    partly = (invalid[0] | invalid[1] | invalid[2]).any(axis=1)
+    all_out = (invalid[0] & invalid[1] & invalid[2]).all(axis=1)
+    deviation[partly] = np.inf
+    deviation[all_out] = 0.0
+    return deviation
+
+
+def _segments_polygon(segments):
+    """
+    Shapely polygon (union) of swath outline segments.
+    """
+    try:
+        if len(segments) == 0:
+            # empty polygon
+            return geometry.Polygon()
+        elif len(segments) == 1:
+            return geometry.Polygon(segments[0].transpose().tolist())
+        else:
+            P = geometry.Polygon(segments[0].transpose().tolist())
+            for i in range(1,len(segments)):
+                P = P.union( geometry.Polygon(
+                        segments[i].transpose().tolist()) )
+        return P
+    except ValueError:
+        # empty polygon if invalid polygon created
+        return geometry.Polygon()
+
+
+def _valid_polygon(P):
+    """
+    Repairs self intersecting polygons, e.g. long swaths folding
+    over in the working projection, so that overlay operations
+    (intersection) do not fail.
+    """
+    if P.is_valid:
+        return P
+    return P.buffer(0)
+
+
+def _true_runs(mask):
+    """
+    Index (first, last) pairs of the runs of True in a boolean array.
+    """
+    edges = np.diff(np.concatenate(([0], np.asarray(mask).astype(np.int8), [0])))
+    return zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1)
+
+
+def _great_circle_distance(lon0, lat0, lons, lats, radius=OrbitalLayer.earth_radius):
+    """
+    Great circle distance in meters from point (lon0, lat0)
+    to points (lons, lats), in degrees.
+    """
+    lon0, lat0 = np.radians(lon0), np.radians(lat0)
+    lons, lats = np.radians(lons), np.radians(lats)
+    a = np.sin((lats-lat0)/2.0)**2 + np.cos(lat0)*np.cos(lats)*np.sin((lons-lon0)/2.0)**2
+    return 2.0*radius*np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
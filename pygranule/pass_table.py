@@ -0,0 +1,54 @@
+from bisect import bisect_right
+
+
+class PassTable(object):
+    """
+    Table of the passes of a satellite instrument over an area
+    of interest, within a time window (horizon), for one set of
+    orbital elements.
+
+    Each pass is an (enter, exit, fraction) tuple, where enter and exit
+    are the datetimes bounding the instrument swath sampling the
+    area of interest, at the resolution of the table cells (one
+    swath scan line step), and fraction is the fraction of the
+    area of interest sampled during the pass.
+
+    Lookups of granule sampling are a bisect against the pass
+    enter times.  Granules within a cell or two of a pass edge
+    are left undecided, to be tested with the exact swath geometry.
+    """
+    def __init__(self, start, end, cell, passes, tle_lines):
+        self.start = start
+        self.end = end
+        self.cell = cell
+        self.passes = passes
+        self.tle_lines = tle_lines
+        self.enters = [ x[0] for x in passes ]
+
+    def __len__(self):
+        return len(self.passes)
+
+    def __iter__(self):
+        return iter(self.passes)
+
+    def covers(self, start, end):
+        """
+        True if granules from start to end can be looked up in this table.
+        """
+        return self.start <= start - self.cell and end + 2*self.cell <= self.end
+
+    def lookup(self, start, end):
+        """
+        Returns True or False if the swath of a granule from start to end
+        certainly does, or does not, sample the area of interest.
+        Returns None if the granule is near a pass edge, where
+        the exact swath geometry decides.
+        """
+        margin = self.cell
+        i = bisect_right(self.enters, end + 2*margin) - 1
+        if i < 0 or self.passes[i][1] < start - margin:
+            return False
+        enter, exit = self.passes[i][:2]
+        if min(end, exit) - max(start, enter) >= 3*margin:
+            return True
+        return None
@@ -5,7 +5,7 @@ import numpy as np
 
 import os
 from pyorbital.geoloc_instrument_definitions import avhrr, viirs
-from pyorbital.geoloc import compute_pixels, get_lonlatalt
+from pyorbital.geoloc import compute_pixels, get_lonlatalt, ScanGeometry
 #from urllib2 import URLError
 from pyorbital.orbital import Orbital
 
@@ -18,8 +18,8 @@ class PyOrbitalLayer(OrbitalLayer):
     __implements__ = (OrbitalLayer,)
 
 
-    def __init__(self, aoi, sat, instrument="AVHRR"):
-        OrbitalLayer.__init__(self,aoi,sat,instrument)
+    def __init__(self, aoi, sat, instrument="AVHRR", working_projection=None):
+        OrbitalLayer.__init__(self,aoi,sat,instrument,working_projection)
         # instantiate orbital module
         
         config_file_path = ""
@@ -52,6 +52,18 @@ class PyOrbitalLayer(OrbitalLayer):
         # for now restart pyorbital with these new elements.
         del self.orbital
         self.orbital = Orbital(self.sat,line1=line1, line2=line2)
+        self.pass_table = None
+        self.swath_ribbons = []
+
+    def sub_satellite_lonlats(self, times):
+        lons, lats, alts = self.orbital.get_lonlatalt(np.array(times, dtype='datetime64[us]'))
+        return lons, lats
+
+    def tle_lines(self):
+        return (self.orbital.tle.line1, self.orbital.tle.line2)
+
+    def tle_epoch(self):
+        return self.orbital.tle.epoch
 
     def orbital_period(self):
         return 24*60/self.orbital.tle.mean_motion
@@ -66,45 +78,64 @@ class PyOrbitalLayer(OrbitalLayer):
         pos_time = get_lonlatalt(pixels_pos, s_times)
         return np.array((pos_time[0],pos_time[1]))
 
-    def next_transit(self, start=datetime.now(), resolution=100):
+    def scan_lines_lonlats(self, times):
         """
-        Next transit time relative to center of aoi.
-        Resolution accuracy defined by subdivision of orbital period.
+        Returns the instrument scan lines starting at each of datetimes times,
+        as an array of shape (2, number of lines, pixels per line).
+        All pixels of all lines are propagated at once.
         """
-        # accuracy in mintues from mean orbital period
-        dt = self.orbital_period()/resolution
+        line_starts = np.array(times, dtype='datetime64[us]')
+        pixel_offsets = (self.scan_geom.times(times[0]) - line_starts[0]).reshape(-1)
+        s_times = line_starts[:,np.newaxis] + pixel_offsets[np.newaxis,:]
+        fovs = np.tile(self.scan_geom.fovs.reshape((2,1,-1)), [1,len(times),1])
+        scan_geom = ScanGeometry(fovs, np.zeros(s_times.shape))
+        pixels_pos = compute_pixels(self.orbital, scan_geom, s_times)
+        pos_time = get_lonlatalt(pixels_pos, s_times)
+        return np.array((pos_time[0],pos_time[1]))
 
-        # observer position
-        alt = 0.0
+    def observer_elevations(self, times):
+        """
+        Elevation (degrees) of the satellite seen from the
+        center of the aoi, at each of datetimes times.
+        """
         lon, lat = self.aoi_center()
-        
+        times = np.array(times, dtype='datetime64[us]')
+        return self.orbital.get_observer_look(times, lon, lat, 0.0)[1]
+
+    def transits(self, start, end, resolution=100):
+        """
+        All transit times relative to center of aoi, within (start, end].
+        Elevation is evaluated over the whole window at once, sampled
+        at a subdivision of the orbital period, and the bracketed
+        maxima are then refined together by bisection on the sign of
+        the elevation time derivative.
+        Transits below the horizon are included.
+        """
         # NOTE: For now I do not use the pyorbital
         # get_next_passes. Because it accepts integer (not float) hours
-        # for the search period, and the accuracy of the transit time
-        # search is not obvious to me at the moment.
-        # Also I would like to allow negative transit time altitudes
-        # - transits below horizon.
-        # Therefore I re-implement the search myself, here to have more control:
-        t_offsets = np.arange(0.0,self.orbital_period()*1.2,dt)
-        e  = np.array( [ self.orbital.get_observer_look(start + timedelta(minutes=t_offset), lon, lat, alt)[1] \
-                    for t_offset in t_offsets ] )
-        
-        # search for local maxima
-        b = (np.roll(e,1)<e)&(np.roll(e,-1)<e)
-        idx = np.where(b[1:]==True)[0][0]+1 #i.e. do not accept index 0 as maximum...
-        
-        ## return a quadratic maximum for good accuracy based on data.
-        ## Quadratic fit to 3 points around maximum elevation 
-        ## seems to improve accuracy by 100-fold.
-        x,y = t_offsets[idx-1:idx+2],e[idx-1:idx+2]
-        fit = np.polyfit(x,y,2)
-        t = -fit[1]/(2.0*fit[0])
-
-        #from matplotlib import pyplot as plt
-        #plt.plot(x,y,'x')
-        #fitx = np.arange(x[0]-1,x[2]+1,0.1)
-        #fity = fit[2]+fit[1]*fitx+fit[0]*(fitx**2)
-        #plt.plot(fitx,fity,'r-')
-        #plt.show()
-        
-        return start + timedelta(minutes=t)
+        # for the search period, and I would like to allow negative transit time
+        # altitudes - transits below horizon.
+        dt = self.orbital_period()/resolution
+        window = (end - start).total_seconds()/60.0
+        t_offsets = np.arange(-dt, window + 2.0*dt, dt)
+        t0 = np.datetime64(start, 'us')
+        times = t0 + (t_offsets*60.0e6).astype('timedelta64[us]')
+        e = self.observer_elevations(times)
+
+        # bracket local maxima
+        idx = np.flatnonzero( (e[1:-1] > e[:-2]) & (e[1:-1] >= e[2:]) ) + 1
+        lower = t_offsets[idx-1]
+        upper = t_offsets[idx+1]
+
+        # refine all maxima at once, to about a millisecond
+        h = 1.0e-5
+        n_iterations = int(np.ceil(np.log2(2.0*dt/(2.0*h))))
+        for i in range(n_iterations if len(idx) > 0 else 0):
+            mid = 0.5*(lower + upper)
+            e_pairs = self.observer_elevations(t0 + (np.concatenate((mid - h, mid + h))*60.0e6).astype('timedelta64[us]'))
+            rising = e_pairs[len(mid):] > e_pairs[:len(mid)]
+            lower = np.where(rising, mid, lower)
+            upper = np.where(rising, upper, mid)
+        t_max = 0.5*(lower + upper)
+
+        return [ start + timedelta(minutes=x) for x in t_max if 0.0 < x <= window ]
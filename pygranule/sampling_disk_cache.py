@@ -0,0 +1,153 @@
+import os
+import sqlite3
+import hashlib
+import time
+
+
+class SamplingDiskCache(object):
+    """
+    Persistent, on disk cache of swath / area of interest sampling
+    results, such as OrbitalLayer.does_swath_sample_aoi and
+    intersect_fraction, so that restarted processes need not
+    recompute them.
+
+    Results are stored in a local SQLite database, in write-ahead-log
+    mode so that concurrent processes may read while one writes.
+    Once the cache holds more than max_entries results, the oldest
+    entries are evicted.  The cache is best effort, a locked or
+    unreadable database counts as a cache miss.
+    """
+    evict_interval = 100 # number of puts between eviction checks
+    query_chunk = 500 # keys per query of get_many, within the SQLite variable limit
+
+    def __init__(self, path, max_entries=100000, timeout=10.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._connection = None
+        self._pid = None
+        self._puts = 0
+
+    def __getstate__(self):
+        # connections are per process, not pickled
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        state['_pid'] = None
+        return state
+
+    def _connect(self):
+        if self._connection is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS sampling "
+                         "(key TEXT PRIMARY KEY, value REAL NOT NULL, created REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sampling_created ON sampling (created)")
+            self._connection = conn
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, key):
+        """
+        Returns the cached float result for key, or None if not cached.
+        """
+        try:
+            row = self._connect().execute("SELECT value FROM sampling WHERE key=?", (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        return row[0]
+
+    def put(self, key, value):
+        """
+        Stores float result value under key.
+        """
+        try:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO sampling (key, value, created) VALUES (?,?,?)",
+                         (key, float(value), time.time()))
+            self._puts += 1
+            if self._puts%self.evict_interval == 0:
+                self.evict()
+        except sqlite3.Error:
+            pass
+
+    def get_many(self, keys):
+        """
+        Returns the list of cached float results for keys, None where not
+        cached, read in a few queries rather than one query per key.
+        """
+        values = {}
+        try:
+            conn = self._connect()
+            for i in range(0, len(keys), self.query_chunk):
+                chunk = keys[i:i+self.query_chunk]
+                rows = conn.execute("SELECT key, value FROM sampling WHERE key IN (%s)"%(",".join("?"*len(chunk))),
+                                    chunk).fetchall()
+                values.update(rows)
+        except sqlite3.Error:
+            pass
+        return [ values.get(key) for key in keys ]
+
+    def put_many(self, items):
+        """
+        Stores a sequence of (key, float result value) pairs,
+        in a single transaction.
+        """
+        now = time.time()
+        rows = [ (key, float(value), now) for key, value in items ]
+        if len(rows) == 0:
+            return
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany("INSERT OR REPLACE INTO sampling (key, value, created) VALUES (?,?,?)", rows)
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+            if self._puts//self.evict_interval != (self._puts + len(rows))//self.evict_interval:
+                self.evict()
+            self._puts += len(rows)
+        except sqlite3.Error:
+            pass
+
+    def evict(self):
+        """
+        Deletes the oldest entries exceeding max_entries.
+        """
+        conn = self._connect()
+        n = conn.execute("SELECT COUNT(*) FROM sampling").fetchone()[0]
+        if n > self.max_entries:
+            conn.execute("DELETE FROM sampling WHERE key IN "
+                         "(SELECT key FROM sampling ORDER BY created LIMIT ?)", (n - self.max_entries,))
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM sampling").fetchone()[0]
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def sampling_key(kind, sat, tle_lines, instrument, aoi, start, period):
+    """
+    Cache key of a sampling result of type kind (e.g. 'sample' or 'fraction'),
+    for satellite, two line element, instrument, area of interest (lon,lat arrays),
+    granule start datetime and period in minutes.
+    """
+    return sampling_keys(kind, sat, tle_lines, instrument, aoi, [start], period)[0]
+
+
+def sampling_keys(kind, sat, tle_lines, instrument, aoi, starts, period):
+    """
+    sampling_key of each of granule start datetimes starts,
+    hashing the two line element and area of interest once.
+    """
+    tle_hash = hashlib.sha1("\n".join(tle_lines)).hexdigest()
+    aoi_hash = hashlib.sha1(repr([ [ float(v) for v in x ] for x in aoi ])).hexdigest()
+    prefix = "|".join((kind, sat, tle_hash, instrument, aoi_hash))
+    period = repr(float(period))
+    return [ "|".join((prefix, start.isoformat(), period)) for start in starts ]
@@ -0,0 +1,141 @@
+import os
+
+
+class SeenFileJournal(object):
+    """
+    A persistent journal of source file names already dealt with,
+    so that repeated polls of a source directory only need to
+    process the files that are new since the last poll.
+
+    Names are recorded as either rejected (failed the granule filter),
+    rejected by area of interest (valid name, but not sampling the area
+    of interest), or transferred (found at, or copied to, the destination).
+    The journal is an append only text file, one entry per line,
+    holding a state code and the file name.  It is rewritten
+    compactly once it holds many duplicate or dropped entries.
+
+    Rejections by area of interest depend on the orbital elements, they
+    are recorded with the epoch of the orbital elements in use, and
+    only count as seen while the journal epoch is the same.
+    """
+    REJECTED = 'R'
+    REJECTED_BY_AOI = 'A'
+    TRANSFERRED = 'T'
+
+    def __init__(self, path):
+        self.path = path
+        self.rejected = set()
+        # name: epoch of the rejection by area of interest
+        self.rejected_by_aoi = {}
+        self.transferred = set()
+        # epoch of the orbital elements in use, set by the filter
+        self.epoch = None
+        self._lines = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path, 'r') as f:
+            for line in f:
+                state, name = line[0], line[2:].rstrip('\n')
+                if state == self.REJECTED:
+                    self.rejected.add(name)
+                elif state == self.REJECTED_BY_AOI:
+                    epoch, name = name.split(' ', 1)
+                    self.rejected_by_aoi[name] = epoch
+                elif state == self.TRANSFERRED:
+                    self.rejected.discard(name)
+                    self.rejected_by_aoi.pop(name, None)
+                    self.transferred.add(name)
+                self._lines += 1
+
+    def _append(self, state, names):
+        if len(names) == 0:
+            return
+        dname = os.path.dirname(self.path)
+        if dname and not os.path.isdir(dname):
+            os.makedirs(dname)
+        with open(self.path, 'a') as f:
+            for name in names:
+                f.write("%s %s\n"%(state, name))
+        self._lines += len(names)
+        # compact when the file holds more than twice the live entries
+        if self._lines > 2*len(self) + 1000:
+            self.compact()
+
+    def __len__(self):
+        return len(self.rejected) + len(self.rejected_by_aoi) + len(self.transferred)
+
+    def __contains__(self, name):
+        return (name in self.rejected or name in self.transferred or
+                (name in self.rejected_by_aoi and self.rejected_by_aoi[name] == _epoch_token(self.epoch)))
+
+    def seen(self, name):
+        """ True if name has been rejected or transferred. """
+        return name in self
+
+    def mark_rejected(self, names):
+        names = [ x for x in names if x not in self ]
+        self.rejected.update(names)
+        self._append(self.REJECTED, names)
+
+    def mark_rejected_by_aoi(self, names):
+        """ Records names as rejected by area of interest, at the journal epoch. """
+        names = [ x for x in names if x not in self ]
+        epoch = _epoch_token(self.epoch)
+        for name in names:
+            self.rejected_by_aoi[name] = epoch
+        self._append(self.REJECTED_BY_AOI, [ "%s %s"%(epoch, x) for x in names ])
+
+    def mark_transferred(self, names):
+        names = [ x for x in names if x not in self.transferred ]
+        self.rejected.difference_update(names)
+        for name in names:
+            self.rejected_by_aoi.pop(name, None)
+        self.transferred.update(names)
+        self._append(self.TRANSFERRED, names)
+
+    def prune(self, names):
+        """
+        Forgets all entries not in names, e.g. files that have
+        been removed from the source archive.
+        """
+        names = set(names)
+        self.rejected.intersection_update(names)
+        for name in list(self.rejected_by_aoi):
+            if name not in names:
+                del self.rejected_by_aoi[name]
+        self.transferred.intersection_update(names)
+        self.compact()
+
+    def compact(self):
+        """
+        Rewrites the journal file with one line per live entry,
+        dropping rejections by area of interest of other epochs.
+        """
+        epoch = _epoch_token(self.epoch)
+        for name, name_epoch in self.rejected_by_aoi.items():
+            if name_epoch != epoch:
+                del self.rejected_by_aoi[name]
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            for name in self.rejected:
+                f.write("%s %s\n"%(self.REJECTED, name))
+            for name, name_epoch in self.rejected_by_aoi.items():
+                f.write("%s %s %s\n"%(self.REJECTED_BY_AOI, name_epoch, name))
+            for name in self.transferred:
+                f.write("%s %s\n"%(self.TRANSFERRED, name))
+        os.rename(tmp_path, self.path)
+        self._lines = len(self)
+
+    def clear(self):
+        self.rejected.clear()
+        self.rejected_by_aoi.clear()
+        self.transferred.clear()
+        self.compact()
+
+
+def _epoch_token(epoch):
+    """ Journal entry token of an orbital element epoch (no spaces). """
+    return str(epoch).replace(' ', 'T')
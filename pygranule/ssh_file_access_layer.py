@@ -58,6 +58,13 @@ class SSHFileAccessLayer(FileAccessLayer):
                     files.append(directory + "/" + x.filename)
         return files
 
+    def list_source_directories(self, directories, threads=4):
+        """
+        Lists several directories on the source file system,
+        one at a time, sharing the single sftp connection.
+        """
+        return FileAccessLayer.list_source_directories(self, directories, threads=1)
+
     def _copy_file(self, source, destination):
         try:
             sftp = self._get_cur_connection()[0]
@@ -0,0 +1,50 @@
+import numpy as np
+
+
+class SwathRibbon(object):
+    """
+    The instrument swath over a time window, as scan lines at a
+    fixed time step in working projection coordinates, computed
+    in one propagation, for one set of orbital elements.
+
+    Scan lines of any granule within the window are cut from the
+    ribbon by time index, lines falling between ribbon lines are
+    interpolated linearly from their neighbours.
+    """
+    def __init__(self, start, step, xs, ys, tle_lines, out_of_bounds_value):
+        self.start = start
+        self.step = step
+        self.xs = xs
+        self.ys = ys
+        self.tle_lines = tle_lines
+        self.out_of_bounds_value = out_of_bounds_value
+        self.end = start + (len(xs)-1)*step
+
+    def covers(self, start, end):
+        """
+        True if scan lines from start to end can be cut from this ribbon.
+        """
+        return self.start <= start and end <= self.end
+
+    def scan_lines(self, start, offsets):
+        """
+        Returns xs, ys arrays (scan lines, pixels) of the scan lines at
+        offsets (array of minutes) from datetime start.
+        """
+        f = (start - self.start).total_seconds()/60.0 + np.asarray(offsets)
+        f /= self.step.total_seconds()/60.0
+        # lines (nearly) on the ribbon grid are taken as they are
+        nearest = np.round(f).astype(int)
+        on_grid = np.abs(f - nearest) < 1.0e-6
+        i = np.clip(np.floor(f).astype(int), 0, len(self.xs)-2)
+        i = np.where(on_grid, np.clip(nearest, 0, len(self.xs)-1), i)
+        w = np.where(on_grid, 0.0, f - i)[:,np.newaxis]
+        j = np.where(on_grid, i, i + 1)
+
+        oob = self.out_of_bounds_value
+        xs = (1.0 - w)*self.xs[i] + w*self.xs[j]
+        ys = (1.0 - w)*self.ys[i] + w*self.ys[j]
+        invalid = (self.xs[i] == oob) | (self.ys[i] == oob) | (self.xs[j] == oob) | (self.ys[j] == oob)
+        xs[invalid] = oob
+        ys[invalid] = oob
+        return xs, ys
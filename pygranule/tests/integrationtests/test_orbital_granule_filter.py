@@ -2,6 +2,8 @@
 import unittest
 
 from pygranule.orbital_granule_filter import OrbitalGranuleFilter
+from datetime import datetime
+from mock import Mock
 
 
 class TestOrbitalGranuleFilter(unittest.TestCase):
@@ -14,6 +16,7 @@ class TestOrbitalGranuleFilter(unittest.TestCase):
                   'time_step':"00:01:00",
                   'time_step_offset':"00:00:00",
                   'area_of_interest':"(-25,62.5),(-25,67),(-13,67),(-13,62.5)"}
+        self.config = config
         self.af = OrbitalGranuleFilter(config)
         # override orbital_layer with a particular TLE orbital element.
         self.af.orbital_layer.set_tle("1 29499U 06044A   11254.96536486  .00000092  00000-0  62081-4 0  5221",
@@ -33,6 +36,19 @@ class TestOrbitalGranuleFilter(unittest.TestCase):
         self.assertFalse(result4)
         self.assertFalse(result5)
 
+    def test_compile_plan(self):
+        tle_lines = self.af.orbital_layer.tle_lines()
+        granule = "/home/msg/archive/AVHRR/avhrr_20140225_133500_noaa19.hrp.bz2"
+        sampled = self.af.validate(granule)
+        # Run
+        self.af.config['area_of_interest'] = "(100,-10),(100,10),(120,10),(120,-10)"
+        self.af.compile_plan()
+        # Assert
+        self.assertTrue(sampled)
+        self.assertFalse(self.af.validate(granule))
+        self.assertEqual(self.af.orbital_layer.aoi.tolist(), [[100,100,120,120],[-10,10,10,-10]])
+        self.assertEqual(self.af.orbital_layer.tle_lines(), tle_lines)
+
     def test_filter(self):
         # Run
         files = ["blabla",
@@ -47,6 +63,97 @@ class TestOrbitalGranuleFilter(unittest.TestCase):
         # Assert
         self.assertItemsEqual(result,[files[2],files[3],files[4]])
 
+    def test_sampling_cache(self):
+        files = ["/home/msg/archive/AVHRR/avhrr_20140225_133400_noaa19.hrp.bz2",
+                 "/home/msg/archive/AVHRR/avhrr_20140225_133500_noaa19.hrp.bz2"]
+        # Run
+        self.af(files)
+        misses = self.af.sampling_cache.misses
+        self.af(files)
+        # Assert
+        self.assertEqual(misses, 2)
+        self.assertEqual(self.af.sampling_cache.misses, 2)
+        self.assertEqual(self.af.sampling_cache.hits, 2)
+
+    def test_filter_processes(self):
+        files = [ "/home/msg/archive/AVHRR/avhrr_20140225_13%02d00_noaa19.hrp.bz2"%(m) for m in range(30,40) ]
+        # Run
+        result = self.af.filter(files, processes=2)
+        # Assert
+        self.assertItemsEqual(result,[files[4],files[5],files[6]])
+
+    def test_complete_processes(self):
+        # Run
+        result = self.af.complete("/home/msg/archive/AVHRR/avhrr_20140225_133500_noaa19.hrp.bz2", processes=2)
+        # Assert
+        self.assertItemsEqual(result, ["/home/msg/archive/AVHRR/avhrr_20140225_133400_noaa19.hrp.bz2",
+                                       "/home/msg/archive/AVHRR/avhrr_20140225_133500_noaa19.hrp.bz2",
+                                       "/home/msg/archive/AVHRR/avhrr_20140225_133600_noaa19.hrp.bz2"])
+
+    def test_filter_pass_table(self):
+        self.config['pass_table_horizon'] = "06:00:00"
+        af = OrbitalGranuleFilter(self.config)
+        af.orbital_layer.set_tle(*self.af.orbital_layer.tle_lines())
+        files = [ "/home/msg/archive/AVHRR/avhrr_20140225_13%02d00_noaa19.hrp.bz2"%(m) for m in range(30,40) ]
+        # Run
+        result = af.filter(files)
+        # Assert
+        self.assertItemsEqual(result,[files[4],files[5],files[6]])
+        self.assertIsNotNone(af.orbital_layer.pass_table)
+
+    def test_filter_outline_tolerance(self):
+        self.config['outline_tolerance'] = "500.0"
+        af = OrbitalGranuleFilter(self.config)
+        af.orbital_layer.set_tle(*self.af.orbital_layer.tle_lines())
+        files = [ "/home/msg/archive/AVHRR/avhrr_20140225_13%02d00_noaa19.hrp.bz2"%(m) for m in range(30,40) ]
+        # Run
+        result = af.filter(files)
+        result_processes = af.filter(files, processes=2)
+        # Assert
+        self.assertEqual(af.orbital_layer.outline_tolerance, 500.0)
+        self.assertItemsEqual(result,[files[4],files[5],files[6]])
+        self.assertItemsEqual(result_processes,[files[4],files[5],files[6]])
+
+    def test_plan_working_projection(self):
+        # Run
+        plan = self.af.plan
+        layer = self.af.orbital_layer
+        # Assert
+        self.assertEqual(layer.working_projection, dict(plan.working_projection))
+        self.assertEqual(layer.aoi.transpose().tolist(), [ list(x) for x in plan.area_of_interest ])
+
+    def test_check_sampling_from_times(self):
+        times = [ datetime(2014,2,25,13,m) for m in range(30,40) ]
+        # Run
+        result1 = self.af.check_sampling_from_times(times)
+        result2 = self.af.check_sampling_from_times(times)
+        # Assert
+        self.assertEqual(result1.tolist(), [ self.af.check_sampling_from_time(t) for t in times ])
+        self.assertEqual(result1.tolist(), [False]*4 + [True]*3 + [False]*3)
+        self.assertEqual(result2.tolist(), result1.tolist())
+        self.assertEqual(self.af.sampling_cache.misses, 10)
+
+    def test_check_sampling_from_times_pass_table(self):
+        self.config['pass_table_horizon'] = "06:00:00"
+        af = OrbitalGranuleFilter(self.config)
+        af.orbital_layer.set_tle(*self.af.orbital_layer.tle_lines())
+        times = [ datetime(2014,2,25,13,m) for m in range(30,40) ]
+        # Run
+        result = af.check_sampling_from_times(times)
+        # Assert
+        self.assertEqual(result.tolist(), [False]*4 + [True]*3 + [False]*3)
+
+    def test_pass_coverage(self):
+        # Run
+        coverage = self.af.pass_coverage("/home/msg/archive/AVHRR/avhrr_20140225_133500_noaa19.hrp.bz2")
+        # Assert
+        self.assertEqual([ x[0] for x in coverage ], [ datetime(2014,2,25,13,m) for m in (34,35,36) ])
+        for t, fraction, cumulative in coverage:
+            self.assertAlmostEqual(fraction, self.af.orbital_layer.intersect_fraction(t, 1.0))
+        self.assertEqual([ x[2] for x in coverage ], sorted( x[2] for x in coverage ))
+        self.assertTrue( 0.0 < coverage[-1][2] <= 1.0 )
+        self.assertTrue( coverage[-1][2] >= max( x[1] for x in coverage ) )
+
     def test_complete(self):
         # Run
         result = self.af.complete("/home/msg/archive/AVHRR/avhrr_20140225_133500_noaa19.hrp.bz2")
@@ -55,6 +162,20 @@ class TestOrbitalGranuleFilter(unittest.TestCase):
                                        "/home/msg/archive/AVHRR/avhrr_20140225_133500_noaa19.hrp.bz2",
                                        "/home/msg/archive/AVHRR/avhrr_20140225_133600_noaa19.hrp.bz2"])
         
+    def test_complete_checks_seed(self):
+        seed = datetime(2014,2,25,13,35)
+        check_sampling_from_time = self.af.check_sampling_from_time
+        self.af.check_sampling_from_time = Mock(side_effect=lambda t, period=None: t != seed and
+                                                check_sampling_from_time(t, period))
+        # Run
+        result = self.af.complete("/home/msg/archive/AVHRR/avhrr_20140225_133500_noaa19.hrp.bz2")
+        result_all = self.af.complete("/home/msg/archive/AVHRR/avhrr_20140225_133500_noaa19.hrp.bz2", contiguous=False)
+        # Assert
+        self.assertItemsEqual(result, ["/home/msg/archive/AVHRR/avhrr_20140225_133500_noaa19.hrp.bz2"])
+        self.assertItemsEqual(result_all, ["/home/msg/archive/AVHRR/avhrr_20140225_133400_noaa19.hrp.bz2",
+                                           "/home/msg/archive/AVHRR/avhrr_20140225_133500_noaa19.hrp.bz2",
+                                           "/home/msg/archive/AVHRR/avhrr_20140225_133600_noaa19.hrp.bz2"])
+
     def test_gf_complete_vs_gbd_complete(self):
         # Run
         gf_result = self.af.complete("/home/msg/archive/AVHRR/avhrr_20140225_133500_noaa19.hrp.bz2")
@@ -3,6 +3,8 @@ import unittest
 
 from pygranule.periodic_granule_filter import PeriodicGranuleFilter
 import os, shutil
+from datetime import datetime
+from mock import Mock
 
 def make_dummy_file(path):
     open(path, 'w').close()
@@ -18,6 +20,7 @@ class TestPeriodicGranuleFilter(unittest.TestCase):
                   'time_step':"00:15:00",
                   'time_step_offset':"00:00:00",
                   'file_destination_pattern':"/tmp/test_pygranule/destin/{0}_{1}_%Y%m%d%H%M"}
+        self.config = config
         # set up some dummy source files and folders
         self.files = ["blabla",
                  "/tmp/test_pygranule/source/IR_108/H-000-MSG3__-MSG3________-IR_108___-000004___-201401231315",
@@ -63,6 +66,134 @@ class TestPeriodicGranuleFilter(unittest.TestCase):
         # Assert
         self.assertItemsEqual(result,[self.files[1],self.files[5]])
 
+    def test_filter_with_validation_cache(self):
+        self.config['validation_cache_size'] = "100"
+        af = PeriodicGranuleFilter(self.config)
+        # Run
+        result1 = af(self.files)
+        result2 = af(self.files)
+        # Assert
+        self.assertItemsEqual(result1,[self.files[1],self.files[5]])
+        self.assertItemsEqual(result2,[self.files[1],self.files[5]])
+        self.assertEqual(af.validation_cache.misses, len(self.files))
+        self.assertEqual(af.validation_cache.hits, len(self.files))
+
+    def test_list_source_time_window(self):
+        # Run
+        result = self.af.list_source_window(datetime(2014,2,20,6,0), datetime(2014,2,20,12,0))
+        # Assert
+        self.assertItemsEqual(result, ["/tmp/test_pygranule/source/IR_108/H-000-MSG3__-MSG3________-IR_108___-000005___-201402200645"])
+
+    def test_list_source_time_window_offset(self):
+        self.config['time_stamp_offset'] = "00:30:00"
+        af = PeriodicGranuleFilter(self.config)
+        af.source_file_name_parser.parse_many = Mock(wraps=af.source_file_name_parser.parse_many)
+        # Run
+        result1 = af.list_source_window(datetime(2014,2,20,6,0), datetime(2014,2,20,7,0))
+        result2 = af.list_source_window(datetime(2014,2,20,7,0), datetime(2014,2,20,7,30))
+        # Assert
+        self.assertItemsEqual(result1, [])
+        self.assertItemsEqual(result2, ["/tmp/test_pygranule/source/IR_108/H-000-MSG3__-MSG3________-IR_108___-000005___-201402200645"])
+        self.assertEqual(af.source_file_name_parser.parse_many.call_count, 2)
+
+    def test_list_source_time_window_dated_directories(self):
+        self.config['file_source_pattern'] = "/tmp/test_pygranule/dated/%Y%m%d/{0}_{1}_%Y%m%d%H%M"
+        af = PeriodicGranuleFilter(self.config)
+        os.makedirs("/tmp/test_pygranule/dated/20140220")
+        os.makedirs("/tmp/test_pygranule/dated/20140222")
+        make_dummy_file("/tmp/test_pygranule/dated/20140220/IR_108_5_201402202300")
+        make_dummy_file("/tmp/test_pygranule/dated/20140220/IR_108_5_201402200645")
+        make_dummy_file("/tmp/test_pygranule/dated/20140222/IR_108_5_201402220015")
+        make_dummy_file("/tmp/test_pygranule/dated/20140222/IR_108_5_201402221200")
+        # Run
+        result = af.list_source_window(datetime(2014,2,20,12,0), datetime(2014,2,22,6,0))
+        records = list(af.iter_list_source_window(datetime(2014,2,20,12,0), datetime(2014,2,22,6,0)))
+        # Assert
+        self.assertItemsEqual(result, ["/tmp/test_pygranule/dated/20140220/IR_108_5_201402202300",
+                                       "/tmp/test_pygranule/dated/20140222/IR_108_5_201402220015"])
+        self.assertItemsEqual([ x.source for x in records ], result.keys())
+
+    def test_list_destination(self):
+        os.mkdir("/tmp/test_pygranule/destin")
+        make_dummy_file("/tmp/test_pygranule/destin/IR_108_5_201402202300")
+        make_dummy_file("/tmp/test_pygranule/destin/bla")
+        # Run
+        result = self.af.list_destination()
+        # Assert
+        self.assertItemsEqual(result, ["/tmp/test_pygranule/destin/IR_108_5_201402202300"])
+        self.assertEqual(result["/tmp/test_pygranule/destin/IR_108_5_201402202300"],
+                         "/tmp/test_pygranule/source/IR_108/H-000-MSG3__-MSG3________-IR_108___-000005___-201402202300")
+
+    def test_list_new(self):
+        # Run
+        result1 = self.af.list_new()
+        os.mkdir("/tmp/test_pygranule/destin")
+        make_dummy_file("/tmp/test_pygranule/destin/IR_108_5_201402202300")
+        result2 = self.af.list_new()
+        # Assert
+        self.assertEqual(len(result1), 2)
+        self.assertItemsEqual(result2, ["/tmp/test_pygranule/source/IR_108/H-000-MSG3__-MSG3________-IR_108___-000005___-201402200645"])
+
+    def test_list_new_file_name_destination(self):
+        self.config['file_destination_pattern'] = "{0}_{1}_%Y%m%d%H%M"
+        af = PeriodicGranuleFilter(self.config)
+        os.mkdir("/tmp/test_pygranule/destin")
+        make_dummy_file("/tmp/test_pygranule/destin/IR_108_5_201402202300")
+        cwd = os.getcwd()
+        os.chdir("/tmp/test_pygranule/destin")
+        try:
+            # Run
+            result = af.list_new()
+            destination = af.list_destination()
+        finally:
+            os.chdir(cwd)
+        # Assert
+        self.assertItemsEqual(result, ["/tmp/test_pygranule/source/IR_108/H-000-MSG3__-MSG3________-IR_108___-000005___-201402200645"])
+        self.assertItemsEqual(destination, ["IR_108_5_201402202300"])
+
+    def test_list_new_with_journal(self):
+        self.config['seen_file_journal'] = "/tmp/test_pygranule/journal"
+        af = PeriodicGranuleFilter(self.config)
+        # Run
+        result1 = af.list_new()
+        result1.transfer()
+        make_dummy_file("/tmp/test_pygranule/source/IR_108/H-000-MSG3__-MSG3________-IR_108___-000006___-201402202315")
+        af = PeriodicGranuleFilter(self.config)
+        af.filter = Mock(wraps=af.filter)
+        result2 = af.list_new()
+        # Assert
+        self.assertEqual(len(result1), 2)
+        self.assertItemsEqual(result2, ["/tmp/test_pygranule/source/IR_108/H-000-MSG3__-MSG3________-IR_108___-000006___-201402202315"])
+        self.assertEqual(len(af.filter.call_args[0][0]), 1)
+        self.assertEqual(len(af.seen_file_journal.transferred), 2)
+        self.assertEqual(len(af.seen_file_journal.rejected), 2)
+
+    def test_iter_filter(self):
+        # Run
+        records = list(self.af.iter_filter(iter(self.files), chunk_size=2))
+        # Assert
+        self.assertEqual([ x.source for x in records ], [self.files[1],self.files[5]])
+        self.assertEqual(records[0].destination, "/tmp/test_pygranule/destin/IR_108_4_201401231315")
+        self.assertEqual(records[0].time, datetime(2014,1,23,13,15))
+        self.assertEqual(records[0].subset, ('IR_108','4'))
+
+    def test_iter_translate(self):
+        # Run
+        records = list(self.af.iter_translate([self.files[1]]))
+        reverse = list(self.af.iter_translate([records[0].destination], reverse=True))
+        # Assert
+        self.assertEqual(records[0].destination, "/tmp/test_pygranule/destin/IR_108_4_201401231315")
+        self.assertEqual(reverse[0].destination, self.files[1])
+        self.assertRaises(ValueError, list, self.af.iter_translate(["blabla"]))
+
+    def test_iter_list_source(self):
+        # Run
+        records = list(self.af.iter_list_source())
+        # Assert
+        self.assertItemsEqual( [ (x.source, x.destination) for x in records ],
+                               [('/tmp/test_pygranule/source/IR_108/H-000-MSG3__-MSG3________-IR_108___-000005___-201402202300', '/tmp/test_pygranule/destin/IR_108_5_201402202300'),
+                                ('/tmp/test_pygranule/source/IR_108/H-000-MSG3__-MSG3________-IR_108___-000005___-201402200645', '/tmp/test_pygranule/destin/IR_108_5_201402200645')] )
+
     def test_getitem(self):
         # Run
         value = self.af['time_step']
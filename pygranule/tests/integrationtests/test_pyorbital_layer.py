@@ -2,7 +2,12 @@
 import unittest
 
 from pygranule.pyorbital_layer import PyOrbitalLayer
-from datetime import datetime
+from pygranule.sampling_disk_cache import SamplingDiskCache
+from datetime import datetime, timedelta
+from mock import Mock
+import numpy as np
+from shapely import geometry
+import shutil, tempfile
 
 class TestPyOrbitalLayer(unittest.TestCase):
     def setUp(self):
@@ -21,5 +26,192 @@ class TestPyOrbitalLayer(unittest.TestCase):
         dt = t - t_ref
 
         self.assertTrue( abs(dt.total_seconds()) < 1.0 )
-        
 
+    def test_transits(self):
+        start_t = datetime(2014,1,23,13,01)
+        end_t = datetime(2014,1,24,13,01)
+        # Run
+        transits = self.ol.transits(start_t, end_t)
+        # Assert
+        self.assertTrue( abs((transits[0] - datetime(2014,1,23,13,26,7)).total_seconds()) < 1.0 )
+        self.assertTrue( all( start_t < t <= end_t for t in transits ) )
+        t = start_t
+        for transit in transits:
+            t = self.ol.next_transit(t)
+            self.assertTrue( abs((t - transit).total_seconds()) < 0.01 )
+
+    def test_pass_table(self):
+        start = datetime(2014,2,25,13,0)
+        # Run
+        table = self.ol.compute_pass_table(start, start + timedelta(hours=3))
+        # Assert
+        self.assertTrue(len(table) > 0)
+        for i in range(0, 170, 3):
+            t = start + timedelta(minutes=i)
+            self.assertEqual( self.ol.does_swath_sample_aoi_by_pass_table(t, 1.0, timedelta(hours=3)),
+                              self.ol.does_swath_sample_aoi(t, 1.0) )
+
+    def test_pass_table_extended_backward(self):
+        start = datetime(2014,2,25,16,0)
+        compute_pass_table = self.ol.compute_pass_table
+        self.ol.compute_pass_table = Mock(side_effect=compute_pass_table)
+        # Run
+        sampled = []
+        for i in range(0, 180, 3):
+            t = start - timedelta(minutes=i)
+            sampled.append( (t, self.ol.does_swath_sample_aoi_by_pass_table(t, 1.0, timedelta(hours=2))) )
+        # Assert
+        self.assertEqual(self.ol.compute_pass_table.call_count, 3)
+        self.assertTrue(self.ol.pass_table.covers(start - timedelta(minutes=180), start))
+        for t, s in sampled:
+            self.assertEqual( s, self.ol.does_swath_sample_aoi(t, 1.0) )
+
+    def test_pass_table_set_tle(self):
+        t = datetime(2014,2,25,13,35)
+        self.ol.does_swath_sample_aoi_by_pass_table(t, 1.0, timedelta(hours=1))
+        # Run
+        self.ol.set_tle(*self.ol.tle_lines())
+        # Assert
+        self.assertIsNone(self.ol.pass_table)
+
+    def test_swath_ribbon(self):
+        start = datetime(2014,2,25,13,30)
+        # Run
+        samples = [ self.ol.does_swath_sample_aoi(start + timedelta(minutes=i), 1.0) for i in range(15) ]
+        xs, ys = self.ol.swath_ribbons[0].scan_lines(start + timedelta(seconds=20), [0.0])
+        lons, lats = self.ol.scan_lines_lonlats([start + timedelta(seconds=20)])
+        # Assert
+        self.assertEqual(len(self.ol.swath_ribbons), 1)
+        self.assertTrue(any(samples))
+        self.assertTrue( np.allclose((xs[0], ys[0]), self.ol.proj(lons[0], lats[0]), atol=100.0) )
+
+    def test_swath_ribbon_set_tle(self):
+        self.ol.swath_working_projection(datetime(2014,2,25,13,30), 1.0)
+        # Run
+        self.ol.set_tle(*self.ol.tle_lines())
+        # Assert
+        self.assertEqual(self.ol.swath_ribbons, [])
+
+    def test_does_swaths_sample_aoi(self):
+        starts = [ datetime(2014,2,25,13,0) + timedelta(minutes=i) for i in range(60) ][::-1]
+        # Run
+        result = self.ol.does_swaths_sample_aoi(starts, 1.0)
+        # Assert
+        self.assertEqual(result.dtype, bool)
+        self.assertEqual(result.tolist(), [ bool(self.ol.does_swath_sample_aoi(t, 1.0)) for t in starts ])
+        self.assertEqual(self.ol.does_swaths_sample_aoi([], 1.0).tolist(), [])
+
+    def test_swaths_coverage(self):
+        starts = [ datetime(2014,2,25,13,m) for m in range(33,38) ]
+        # Run
+        fractions, cumulative = self.ol.swaths_coverage(starts, 1.0)
+        empty = self.ol.swaths_coverage([], 1.0)
+        # Assert
+        self.assertEqual(fractions[0], 0.0)
+        self.assertTrue( np.allclose(fractions, [ self.ol.intersect_fraction(t, 1.0) for t in starts ]) )
+        self.assertTrue( (np.diff(cumulative) >= 0.0).all() )
+        self.assertAlmostEqual(cumulative[-1], self.ol.intersect_fraction(starts[0], 5.0), places=3)
+        self.assertEqual(len(empty[0]), 0)
+
+    def test_outline_tolerance_batches(self):
+        self.ol.outline_tolerance = 100000.0
+        starts = [ datetime(2014,2,25,13,m) for m in range(30,40) ]
+        # Run
+        fractions, cumulative = self.ol.swaths_coverage(starts, 1.0)
+        sampled = self.ol.does_swaths_sample_aoi(starts, 1.0)
+        # Assert
+        self.assertTrue( np.allclose(fractions, [ self.ol.intersect_fraction(t, 1.0) for t in starts ]) )
+        self.assertEqual(sampled.tolist(), [ bool(self.ol.does_swath_sample_aoi(t, 1.0)) for t in starts ])
+
+    def test_aoi_geometry(self):
+        aoi = self.ol.aoi_polygon()
+        minx, miny, maxx, maxy = self.ol.aoi_bounds
+        far = geometry.box(maxx + 1.0e5, miny, maxx + 2.0e5, maxy)
+        overlapping = geometry.box(minx - 1.0e5, miny, minx + 1.0e5, maxy)
+        # Assert
+        self.assertIs(self.ol.aoi_polygon(), aoi)
+        self.assertTrue(self.ol.aoi_prepared.contains(aoi.centroid))
+        self.assertFalse(self.ol._samples_aoi(far))
+        self.assertTrue(self.ol._samples_aoi(overlapping))
+        self.assertFalse(self.ol._samples_aoi(geometry.Polygon()))
+
+    def test_scan_lines_lonlats(self):
+        times = [ datetime(2014,2,25,13,35) + timedelta(seconds=6*i) for i in range(5) ]
+        # Run
+        lonlats = self.ol.scan_lines_lonlats(times)
+        # Assert
+        self.assertEqual(lonlats.shape[:2], (2,5))
+        for i, t in enumerate(times):
+            self.assertTrue( np.allclose(lonlats[:,i,:], self.ol.scan_line_lonlats(t).reshape((2,-1))) )
+
+    def test_swath_lonlats(self):
+        # Run
+        lonlats = self.ol.swath_lonlats(datetime(2014,2,25,13,35), 3.0)
+        # Assert
+        self.assertEqual(lonlats.ndim, 2)
+        self.assertEqual(lonlats.shape[0], 2)
+
+    def test_outline_tolerance(self):
+        t = datetime(2014,1,23,13,20)
+        fixed = self.ol.swath_polygon(t, 15.0)
+        # reference outline at fine steps
+        lons, lats = self.ol.scan_lines_lonlats([ t + timedelta(seconds=3*i) for i in range(301) ])
+        xs, ys = self.ol.proj(lons, lats)
+        reference = geometry.Polygon(np.concatenate((np.array((xs[0],ys[0])), np.array((xs[1:-1,-1],ys[1:-1,-1])),
+                                                     np.array((xs[-1,::-1],ys[-1,::-1])),
+                                                     np.array((xs[-2:0:-1,0],ys[-2:0:-1,0]))), axis=1).transpose())
+        # Run
+        self.ol.outline_tolerance = 500.0
+        adaptive = self.ol.swath_polygon(t, 15.0)
+        lonlats = self.ol.swath_lonlats(t, 15.0)
+        # Assert
+        self.assertTrue( len(adaptive.exterior.coords) < len(fixed.exterior.coords)/2 )
+        self.assertTrue( adaptive.hausdorff_distance(reference) < 500.0 )
+        self.assertTrue( geometry.Polygon(np.array(self.ol.proj(*lonlats)).transpose()).hausdorff_distance(reference) < 500.0 )
+
+    def test_outline_tolerance_short_swath(self):
+        t = datetime(2014,1,23,13,20)
+        # reference outline at fine steps
+        lons, lats = self.ol.scan_lines_lonlats([ t + timedelta(seconds=3*i) for i in range(101) ])
+        xs, ys = self.ol.proj(lons, lats)
+        reference = geometry.Polygon(np.concatenate((np.array((xs[0],ys[0])), np.array((xs[1:-1,-1],ys[1:-1,-1])),
+                                                     np.array((xs[-1,::-1],ys[-1,::-1])),
+                                                     np.array((xs[-2:0:-1,0],ys[-2:0:-1,0]))), axis=1).transpose())
+        # Run
+        self.ol.outline_tolerance = 500.0
+        even = self.ol.swath_polygon(t, 5.0)
+        self.ol.adaptive_outline_min_period = 0.0
+        adaptive = self.ol.swath_polygon(t, 5.0)
+        # Assert
+        self.assertTrue( len(even.exterior.coords) > len(adaptive.exterior.coords) )
+        self.assertTrue( even.hausdorff_distance(reference) < 500.0 )
+        self.assertTrue( adaptive.hausdorff_distance(reference) < 500.0 )
+
+    def test_could_swath_sample_aoi(self):
+        # Run
+        result1 = self.ol.could_swath_sample_aoi(datetime(2014,2,25,13,35), 1.0)
+        result2 = self.ol.could_swath_sample_aoi(datetime(2014,2,25,16,0), 1.0)
+        result3 = self.ol.does_swath_sample_aoi(datetime(2014,2,25,16,0), 1.0)
+        # Assert
+        self.assertTrue(result1)
+        self.assertFalse(result2)
+        self.assertFalse(result3)
+
+    def test_disk_cache(self):
+        workdir = tempfile.mkdtemp()
+        t = datetime(2014,2,25,13,34)
+        try:
+            self.ol.disk_cache = SamplingDiskCache(workdir+"/sampling.db")
+            result1 = self.ol.does_swath_sample_aoi(t, 1.0)
+            fraction1 = self.ol.intersect_fraction(t, 1.0)
+            # Run, without any swath computation
+            self.ol.swath_polygon = Mock(side_effect=AssertionError)
+            result2 = self.ol.does_swath_sample_aoi(t, 1.0)
+            fraction2 = self.ol.intersect_fraction(t, 1.0)
+            self.ol.disk_cache.close()
+        finally:
+            shutil.rmtree(workdir)
+        # Assert
+        self.assertTrue(result1)
+        self.assertEqual(result2, result1)
+        self.assertEqual(fraction2, fraction1)
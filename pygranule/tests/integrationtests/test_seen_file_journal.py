@@ -0,0 +1,41 @@
+import unittest
+
+from pygranule.seen_file_journal import SeenFileJournal
+from datetime import datetime
+import os, tempfile
+
+
+class TestSeenFileJournal(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".journal")
+        os.close(fd)
+        self.journal = SeenFileJournal(self.path)
+        self.journal.epoch = datetime(2014,2,20,12,0)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_rejected_by_aoi_epoch(self):
+        self.journal.mark_rejected(["blabla"])
+        self.journal.mark_rejected_by_aoi(["granule1", "granule2"])
+        self.journal.mark_transferred(["granule2"])
+        # Run
+        reloaded = SeenFileJournal(self.path)
+        reloaded.epoch = datetime(2014,2,20,12,0)
+        seen_same_epoch = [ x in reloaded for x in ("blabla", "granule1", "granule2") ]
+        reloaded.epoch = datetime(2014,2,21,12,0)
+        seen_new_epoch = [ x in reloaded for x in ("blabla", "granule1", "granule2") ]
+        # Assert
+        self.assertEqual(seen_same_epoch, [True, True, True])
+        self.assertEqual(seen_new_epoch, [True, False, True])
+
+    def test_compact_drops_other_epochs(self):
+        self.journal.mark_rejected_by_aoi(["granule1"])
+        self.journal.epoch = datetime(2014,2,21,12,0)
+        self.journal.mark_rejected_by_aoi(["granule1", "granule2"])
+        # Run
+        self.journal.compact()
+        reloaded = SeenFileJournal(self.path)
+        # Assert
+        self.assertEqual(reloaded.rejected_by_aoi, {"granule1":"2014-02-21T12:00:00",
+                                                    "granule2":"2014-02-21T12:00:00"})
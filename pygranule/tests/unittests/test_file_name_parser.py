@@ -1,8 +1,9 @@
 
 import unittest
 
-from pygranule.file_name_parser import FileNameParser
-from datetime import datetime
+from pygranule.file_name_parser import FileNameParser, file_name_translator
+from datetime import datetime, timedelta
+import numpy as np
 
 class TestFileNameParser(unittest.TestCase):
     def setUp(self):
@@ -59,3 +60,109 @@ class TestFileNameParser(unittest.TestCase):
         dirs = self.fnp.directories()
         # Assert
         self.assertItemsEqual(dirs, ('/seviri/WV_073','/seviri/IR_108'))
+
+    def test_parse(self):
+        # Run
+        result = self.fnp.parse("/seviri/WV_073/H-000-MSG3__-MSG3________-WV_073___-000006___-201401231355")
+        # Assert
+        self.assertEqual( result, (datetime(2014,1,23,13,55), ('WV_073','6')) )
+
+    def test_parse_invalid(self):
+        # Run, mismatching repeated subset, unknown segment and bad month
+        result1 = self.fnp.parse("/seviri/IR_108/H-000-MSG3__-MSG3________-WV_073___-000006___-201401231355")
+        result2 = self.fnp.parse("/seviri/WV_073/H-000-MSG3__-MSG3________-WV_073___-000009___-201401231355")
+        result3 = self.fnp.parse("/seviri/WV_073/H-000-MSG3__-MSG3________-WV_073___-000006___-201413231355")
+        # Assert
+        self.assertIsNone( result1 )
+        self.assertIsNone( result2 )
+        self.assertIsNone( result3 )
+
+    def test_parse_unsupported_directive(self):
+        fnp = FileNameParser("/data/{0}_%d%b%Y_%H%M.dat", "{a,b}")
+        # Run
+        result = fnp.parse("/data/b_23Jan2014_1355.dat")
+        # Assert
+        self.assertIsNone( fnp.regex )
+        self.assertEqual( result, (datetime(2014,1,23,13,55), ('b',)) )
+
+    def test_parse_many(self):
+        files = ["/seviri/WV_073/H-000-MSG3__-MSG3________-WV_073___-000006___-201401231355",
+                 "blabla",
+                 "/seviri/IR_108/H-000-MSG3__-MSG3________-IR_108___-000002___-201401231410"]
+        # Run
+        times, codes, valid = self.fnp.parse_many(files)
+        # Assert
+        self.assertEqual( valid.tolist(), [True, False, True] )
+        self.assertEqual( times[0], np.datetime64('2014-01-23T13:55') )
+        self.assertTrue( np.isnat(times[1]) )
+        self.assertEqual( self.fnp.subset_tuples[codes[0]], ('WV_073','6') )
+        self.assertEqual( codes[1], -1 )
+        self.assertEqual( self.fnp.subset_tuples[codes[2]], ('IR_108','2') )
+
+    def test_filename(self):
+        t = datetime(2014,1,23,13,55,7)
+        pattern = "/data/{{x}}_{0}/%y%j_%Y%m%d_%H%M%S_100%%_%b_{1}"
+        fnp = FileNameParser(pattern, "{a:{1..2}}")
+        # Run
+        result = fnp.filename(t, ('a','2'))
+        # Assert
+        self.assertEqual( result, t.strftime(pattern).format('a','2') )
+        self.assertEqual( fnp.parse(result), (datetime(2014,1,23,13,55,7), ('a','2')) )
+
+    def test_file_name_translator(self):
+        fnp_B = FileNameParser("/destin/{0}_{1}_%Y%m%d%H%M", "{IR_108:{1..8}, WV_073:{1..8}}")
+        files = ["/seviri/WV_073/H-000-MSG3__-MSG3________-WV_073___-000006___-201401231355",
+                 "/seviri/IR_108/H-000-MSG3__-MSG3________-IR_108___-000002___-201401231410"]
+        # Run
+        result = file_name_translator(files, self.fnp, fnp_B)
+        reverse = file_name_translator(result, fnp_B, self.fnp)
+        # Assert
+        self.assertEqual( result, ["/destin/WV_073_6_201401231355", "/destin/IR_108_2_201401231410"] )
+        self.assertEqual( reverse, files )
+        self.assertRaises( ValueError, file_name_translator, ["blabla"], self.fnp, fnp_B )
+
+    def test_subset_table(self):
+        # Assert
+        self.assertEqual( len(self.fnp.subset_table), 16 )
+        self.assertIn( ('/seviri/WV_073/H-000-MSG3__-MSG3________-WV_073___-000003___-%Y%m%d%H%M', ('WV_073','3')),
+                       self.fnp.subset_table )
+        self.assertEqual( self.fnp.subset_tuples, tuple( x[1] for x in self.fnp.subset_table ) )
+
+    def test_directories_with_time(self):
+        fnp = FileNameParser("/data/{0}/%Y%m%d/avhrr_%Y%m%d_%H%M.bz2", "{a,b}")
+        # Run
+        dirs = fnp.directories(datetime(2014,1,23,13,55))
+        # Assert
+        self.assertItemsEqual(dirs, ('/data/a/20140123','/data/b/20140123'))
+
+    def test_directories_from_time_range(self):
+        fnp = FileNameParser("/data/{0}/%Y%m%d/avhrr_%Y%m%d_%H%M.bz2", "{a,b}")
+        # Run
+        dirs = fnp.directories_from_time_range(datetime(2014,1,23,23,30), datetime(2014,1,25,0,10))
+        no_dirs = fnp.directories_from_time_range(datetime(2014,1,25), datetime(2014,1,23))
+        # Assert
+        self.assertEqual(dirs, ['/data/a/20140123','/data/b/20140123',
+                                '/data/a/20140124','/data/b/20140124',
+                                '/data/a/20140125','/data/b/20140125'])
+        self.assertEqual(no_dirs, [])
+
+    def test_directories_from_time_range_without_time(self):
+        # Run
+        dirs = self.fnp.directories_from_time_range(datetime(2014,1,23), datetime(2014,1,25))
+        # Assert
+        self.assertEqual(dirs, ['/seviri/IR_108','/seviri/WV_073'])
+
+    def test_filenames_from_time_range(self):
+        t0 = datetime(2014,1,23,23,30)
+        t1 = datetime(2014,1,24,1,0)
+        dt = timedelta(minutes=15)
+        reference_filenames = []
+        t = t0
+        while t < t1:
+            reference_filenames += self.fnp.filenames_from_time(t)
+            t += dt
+        # Run
+        filenames = list(self.fnp.filenames_from_time_range(t0, t1, dt))
+        # Assert
+        self.assertEqual( len(filenames), 6*16 )
+        self.assertEqual( filenames, reference_filenames )
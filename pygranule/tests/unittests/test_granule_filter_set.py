@@ -0,0 +1,87 @@
+import unittest
+from mock import Mock
+
+from pygranule.periodic_granule_filter import PeriodicGranuleFilter
+from pygranule.granule_filter_set import GranuleFilterSet
+
+
+class TestGranuleFilterSet(unittest.TestCase):
+    def setUp(self):
+        config_ir = {'config_name':"IR",
+                     'protocol':"local",
+                     'file_source_pattern':"/tmp/test_pygranule/source/H-000-MSG3__-MSG3________-{0}___-00000{1}___-%Y%m%d%H%M",
+                     'subsets':"{IR_108:{1..8}}",
+                     'time_step':"00:15:00",
+                     'file_destination_pattern':"/tmp/test_pygranule/destin/ir/"}
+        config_wv = {'config_name':"WV",
+                     'protocol':"local",
+                     'file_source_pattern':"/tmp/test_pygranule/source/H-000-MSG3__-MSG3________-{0}___-00000{1}___-%Y%m%d%H%M",
+                     'subsets':"{WV_073:{1..8}}",
+                     'time_step':"00:15:00",
+                     'file_destination_pattern':"/tmp/test_pygranule/destin/wv/"}
+        config_avhrr = {'config_name':"AVHRR",
+                        'protocol':"local",
+                        'file_source_pattern':"/tmp/test_pygranule/avhrr/avhrr_%Y%m%d_%H%M00_noaa19.hrp.bz2"}
+        self.gfs = GranuleFilterSet([PeriodicGranuleFilter(config_ir),
+                                     PeriodicGranuleFilter(config_wv),
+                                     PeriodicGranuleFilter(config_avhrr)])
+        self.files = ["blabla",
+                      "/tmp/test_pygranule/source/H-000-MSG3__-MSG3________-IR_108___-000004___-201401231315",
+                      "/tmp/test_pygranule/source/H-000-MSG3__-MSG3________-WV_073___-000002___-201401231315",
+                      "/tmp/test_pygranule/source/H-000-MSG3__-MSG3________-WV_073___-000002___-201401231310",
+                      "/tmp/test_pygranule/source/H-000-MSG3__-MSG3________-IR_120___-000002___-201401231315",
+                      "/tmp/test_pygranule/avhrr/avhrr_20140225_133400_noaa19.hrp.bz2"]
+
+    def test_candidates(self):
+        # Run
+        result1 = self.gfs.candidates(self.files[1])
+        result2 = self.gfs.candidates(self.files[5])
+        result3 = self.gfs.candidates(self.files[0])
+        # Assert
+        self.assertEqual(result1, ["IR"])
+        self.assertEqual(result2, ["AVHRR"])
+        self.assertEqual(result3, [])
+
+    def test_route(self):
+        # Run
+        result = self.gfs.route(self.files)
+        # Assert
+        self.assertEqual(result["IR"], [self.files[1]])
+        self.assertEqual(result["WV"], [self.files[2], self.files[3]])
+        self.assertEqual(result["AVHRR"], [self.files[5]])
+
+    def test_filter(self):
+        # Run
+        result = self.gfs.filter(self.files)
+        # Assert
+        self.assertItemsEqual(result["IR"], [self.files[1]])
+        self.assertItemsEqual(result["WV"], [self.files[2]])
+        self.assertEqual(result["WV"][self.files[2]],
+                         "/tmp/test_pygranule/destin/wv/H-000-MSG3__-MSG3________-WV_073___-000002___-201401231315")
+        self.assertItemsEqual(result["AVHRR"], [self.files[5]])
+
+    def test_filter_parses_once(self):
+        for name in self.gfs:
+            parser = self.gfs[name].source_file_name_parser
+            parser.parse = Mock(wraps=parser.parse)
+        # Run
+        result = self.gfs.filter(self.files)
+        # Assert
+        self.assertItemsEqual(result["WV"], [self.files[2]])
+        self.assertEqual(self.gfs["IR"].source_file_name_parser.parse.call_count, 1)
+        self.assertEqual(self.gfs["WV"].source_file_name_parser.parse.call_count, 2)
+        self.assertEqual(self.gfs["AVHRR"].source_file_name_parser.parse.call_count, 1)
+
+    def test_list_source(self):
+        # mock
+        fal = self.gfs["IR"].file_access_layer
+        fal.list_source_directory = Mock(side_effect = lambda d: [ x for x in self.files if x.startswith(d+"/") ])
+        for name in self.gfs:
+            self.gfs[name].file_access_layer = fal
+        # Run
+        result = self.gfs.list_source()
+        # Assert
+        self.assertEqual(fal.list_source_directory.call_count, 2)
+        self.assertItemsEqual(result["IR"], [self.files[1]])
+        self.assertItemsEqual(result["WV"], [self.files[2]])
+        self.assertItemsEqual(result["AVHRR"], [self.files[5]])
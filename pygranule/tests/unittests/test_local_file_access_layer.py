@@ -25,6 +25,16 @@ class TestLocalFileAccessLayer(unittest.TestCase):
         files = self.fal.list_source_directory('/somedir')
         self.assertItemsEqual(files,['/somedir/file1','/somedir/file2','/somedir/file3'])
 
+    def test_scan_local_directory(self):
+        # Run
+        files = self.fal.scan_local_directory('/somedir')
+        self.fal.os.path.isdir.return_value = False
+        missing = self.fal.scan_local_directory('/missing')
+        # Assert
+        self.assertItemsEqual(files,['/somedir/file1','/somedir/file2','/somedir/file3'])
+        self.assertEqual(missing, [])
+        self.assertEqual(self.fal.os.path.isfile.call_count, 0)
+
     def test_copy_file(self):
         self.assertIsNone( self.fal.copy_file("/somedir/file1","/somedir/file5") )
 
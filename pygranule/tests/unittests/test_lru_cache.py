@@ -0,0 +1,37 @@
+import unittest
+
+from pygranule.lru_cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = LRUCache(maxsize=3)
+        for key in ('a','b','c'):
+            self.cache.put(key, key.upper())
+
+    def test_get(self):
+        # Run
+        result1 = self.cache.get('a')
+        result2 = self.cache.get('x')
+        # Assert
+        self.assertEqual(result1, 'A')
+        self.assertIsNone(result2)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1,1))
+
+    def test_eviction(self):
+        # Run, 'a' becomes most recent, so 'b' is evicted
+        self.cache.get('a')
+        self.cache.put('d', 'D')
+        # Assert
+        self.assertEqual(len(self.cache), 3)
+        self.assertNotIn('b', self.cache)
+        self.assertIn('a', self.cache)
+        self.assertIn('d', self.cache)
+
+    def test_clear(self):
+        # Run
+        self.cache.get('a')
+        self.cache.clear()
+        # Assert
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual((self.cache.hits, self.cache.misses), (0,0))
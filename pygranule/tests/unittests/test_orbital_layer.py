@@ -0,0 +1,91 @@
+import unittest
+
+from pygranule.orbital_layer import _outline_segments, _adaptive_scan_lines, _outline_deviation
+import numpy as np
+
+
+class TestOutlineSegments(unittest.TestCase):
+    def setUp(self):
+        # 5 scan lines of 3 pixels, line 2 out of bounds,
+        # last pixel of line 3 out of bounds
+        self.oob = 1.0e30
+        self.xs = np.array([[0.,1.,2.],
+                            [0.,1.,2.],
+                            [0.,1.,2.],
+                            [0.,1.,2.],
+                            [0.,1.,2.]])
+        self.ys = np.array([[0.,0.,0.],
+                            [1.,1.,1.],
+                            [2.,2.,2.],
+                            [3.,3.,3.],
+                            [4.,4.,4.]])
+        self.xs[2,:] = self.oob
+        self.ys[3,2] = self.oob
+
+    def test_outline_segments(self):
+        # Run
+        segments = _outline_segments(self.xs, self.ys, self.oob)
+        # Assert
+        self.assertEqual(len(segments), 2)
+        self.assertEqual(segments[0].tolist(), [[0.,1.,2.,2.,1.,0.],
+                                                [0.,0.,0.,1.,1.,1.]])
+        self.assertEqual(segments[1].tolist(), [[0.,1.,2.,1.,0.],
+                                                [3.,3.,4.,4.,4.]])
+
+    def test_outline_segments_with_middle_lines(self):
+        xs = self.xs[3:]
+        ys = self.ys[3:]
+        xs = np.vstack((xs, [[0.,1.,2.]]))
+        ys = np.vstack((ys, [[5.,5.,5.]]))
+        # Run
+        segments = _outline_segments(xs, ys, self.oob)
+        # Assert
+        self.assertEqual(len(segments), 1)
+        self.assertEqual(segments[0].tolist(), [[0.,0.,1.,2.,2.,1.,0.],
+                                                [4.,3.,3.,4.,5.,5.,5.]])
+
+    def test_outline_segments_all_out_of_bounds(self):
+        # Run
+        segments = _outline_segments(np.zeros((3,3))+self.oob, np.zeros((3,3))+self.oob, self.oob)
+        # Assert
+        self.assertEqual(segments, [])
+
+
+class TestAdaptiveScanLines(unittest.TestCase):
+    def setUp(self):
+        # scan lines of 3 pixels across a circular track of radius 1000,
+        # offsets in radians, out of bounds beyond offset 1.0
+        self.oob = 1.0e30
+        def scan_lines(offsets):
+            offsets = np.asarray(offsets)[:,np.newaxis]
+            r = np.array([[900.,1000.,1100.]])
+            xs = r*np.cos(offsets)
+            ys = r*np.sin(offsets)
+            xs[offsets[:,0] > 1.0] = self.oob
+            ys[offsets[:,0] > 1.0] = self.oob
+            return [xs, ys]
+        self.scan_lines = scan_lines
+
+    def test_adaptive_scan_lines(self):
+        # Run
+        offsets, (xs, ys) = _adaptive_scan_lines(self.scan_lines, 0.8, 0.4, 0.001, 1.0, self.oob)
+        # Assert
+        self.assertEqual(offsets[0], 0.0)
+        self.assertEqual(offsets[-1], 0.8)
+        self.assertTrue( (np.diff(offsets) > 0.0).all() )
+        self.assertTrue( np.diff(offsets).max() <= 0.1 )
+        mids = 0.5*(offsets[1:] + offsets[:-1])
+        mx, my = self.scan_lines(mids)
+        deviation = _outline_deviation(xs[:-1], ys[:-1], mx, my, xs[1:], ys[1:], self.oob)
+        self.assertTrue( deviation.max() <= 1.0 )
+
+    def test_adaptive_scan_lines_out_of_bounds(self):
+        # Run
+        offsets, (xs, ys) = _adaptive_scan_lines(self.scan_lines, 1.6, 0.4, 0.01, 1000.0, self.oob)
+        # Assert
+        steps = np.diff(offsets)
+        self.assertTrue( steps.min() > 0.005 )
+        last_valid = np.flatnonzero(xs[:,0] != self.oob)[-1]
+        self.assertTrue( steps[last_valid] <= 0.01 )
+        self.assertTrue( steps.max() == 0.4 )
+        self.assertTrue( (xs[offsets > 1.0] == self.oob).all() )
@@ -0,0 +1,41 @@
+import unittest
+
+from pygranule.pass_table import PassTable
+from datetime import datetime, timedelta
+
+
+class TestPassTable(unittest.TestCase):
+    def setUp(self):
+        self.t0 = datetime(2014,2,25)
+        self.cell = timedelta(seconds=6)
+        passes = [(datetime(2014,2,25,10,0), datetime(2014,2,25,10,5), 1.0),
+                  (datetime(2014,2,25,11,40), datetime(2014,2,25,11,42), 0.5)]
+        self.table = PassTable(self.t0, self.t0 + timedelta(days=1), self.cell, passes, ('line1','line2'))
+
+    def test_covers(self):
+        # Assert
+        self.assertTrue(self.table.covers(datetime(2014,2,25,10,0), datetime(2014,2,25,10,1)))
+        self.assertFalse(self.table.covers(self.t0, self.t0 + timedelta(minutes=1)))
+        self.assertFalse(self.table.covers(datetime(2014,2,25,23,59), datetime(2014,2,26)))
+
+    def test_lookup(self):
+        def lookup(h, m, s=0, period=1.0):
+            t = datetime(2014,2,25,h,m,s)
+            return self.table.lookup(t, t + timedelta(minutes=period))
+        # Assert
+        self.assertFalse(lookup(0,0))
+        self.assertFalse(lookup(9,50))
+        self.assertFalse(lookup(10,30))
+        self.assertFalse(lookup(23,0))
+        self.assertTrue(lookup(10,2))
+        self.assertTrue(lookup(9,59,30))
+        self.assertTrue(lookup(11,30,period=30.0))
+        self.assertIsNone(lookup(9,59,5))
+        self.assertIsNone(lookup(10,4,55))
+        self.assertIsNone(lookup(11,39,0))
+
+    def test_empty_table(self):
+        table = PassTable(self.t0, self.t0 + timedelta(days=1), self.cell, [], ('line1','line2'))
+        # Assert
+        self.assertEqual(len(table), 0)
+        self.assertFalse(table.lookup(datetime(2014,2,25,10,0), datetime(2014,2,25,10,1)))
@@ -4,7 +4,8 @@ from mock import Mock
 
 from pygranule.periodic_granule_filter import PeriodicGranuleFilter
 import os, shutil
-from datetime import datetime
+import pickle
+from datetime import datetime, timedelta
 
 def make_dummy_file(path):
     open(path, 'w').close()
@@ -53,12 +54,33 @@ class TestPeriodicGranuleFilter(unittest.TestCase):
         # Assert
         self.assertItemsEqual(result,self.file)
 
+    def test_filter_samples_once_per_time_stamp(self):
+        files = [ self.file[0].replace("000004","00000%d"%(i)) for i in range(1,9) ]
+        # Run
+        result = self.af(files)
+        # Assert
+        self.assertItemsEqual(result, files)
+        self.assertEqual(self.af.check_sampling_from_time.call_count, 1)
+
     def test_getitem(self):
         # Run
         value = self.af['time_step']
         # Assert
         self.assertEqual(value,self.config['time_step'])
 
+    def test_plan(self):
+        # Run (on an unmocked filter)
+        plan = pickle.loads(pickle.dumps(PeriodicGranuleFilter(self.config).plan, 2))
+        # Assert
+        self.assertEqual(plan.time_step, timedelta(minutes=15))
+        self.assertEqual(plan.time_step_offset, timedelta(0))
+        self.assertEqual(plan.time_stamp_offset, timedelta(0))
+        self.assertIsNone(plan.granule_duration)
+        self.assertEqual(plan.area_of_interest, ())
+        self.assertEqual(plan.source_file_name_parser.parse(self.file[0]),
+                         (datetime(2014,1,23,13,15), ('IR_108','4')))
+        self.assertRaises(AttributeError, setattr, plan, 'time_step', None)
+
     def test_list_source(self):
         # Run
         result = self.af.list_source()
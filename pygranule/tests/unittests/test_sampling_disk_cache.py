@@ -0,0 +1,74 @@
+import unittest
+
+from pygranule.sampling_disk_cache import SamplingDiskCache, sampling_key, sampling_keys
+from datetime import datetime
+import os, pickle, tempfile
+
+
+class TestSamplingDiskCache(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.cache = SamplingDiskCache(self.path, max_entries=5)
+        self.key = sampling_key('sample', "NOAA 19", ("line1","line2"), "AVHRR",
+                                [[-25,-13],[62.5,67]], datetime(2014,2,25,13,34), 1.0)
+
+    def tearDown(self):
+        self.cache.close()
+        for path in (self.path, self.path+"-wal", self.path+"-shm"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def test_get_put(self):
+        # Run
+        result1 = self.cache.get(self.key)
+        self.cache.put(self.key, True)
+        result2 = self.cache.get(self.key)
+        # Assert
+        self.assertIsNone(result1)
+        self.assertEqual(result2, 1.0)
+
+    def test_get_put_many(self):
+        self.cache.max_entries = 1000
+        self.cache.put("key0", 0.5)
+        # Run
+        self.cache.put_many([ ("key%d"%(i), i) for i in range(1, 700) ])
+        result = self.cache.get_many([ "key%d"%(i) for i in range(701) ])
+        # Assert
+        self.assertEqual(result, [0.5] + [ float(i) for i in range(1, 700) ] + [None])
+        self.assertEqual(len(self.cache), 700)
+
+    def test_persistence(self):
+        self.cache.put(self.key, 0.25)
+        # Run, through another (unpickled) cache object
+        other = pickle.loads(pickle.dumps(self.cache))
+        result = other.get(self.key)
+        other.close()
+        # Assert
+        self.assertEqual(result, 0.25)
+
+    def test_key(self):
+        key2 = sampling_key('sample', "NOAA 19", ("line1","line2 "), "AVHRR",
+                            [[-25,-13],[62.5,67]], datetime(2014,2,25,13,34), 1.0)
+        # Assert
+        self.assertNotEqual(self.key, key2)
+
+    def test_keys(self):
+        starts = [ datetime(2014,2,25,13,34), datetime(2014,2,25,13,35) ]
+        # Run
+        keys = sampling_keys('sample', "NOAA 19", ("line1","line2"), "AVHRR", [[-25,-13],[62.5,67]], starts, 1.0)
+        # Assert
+        self.assertEqual(keys[0], self.key)
+        self.assertNotEqual(keys[1], self.key)
+
+    def test_evict(self):
+        # Run
+        for i in range(8):
+            self.cache.put("key%d"%(i), i)
+        self.cache.evict()
+        # Assert
+        self.assertEqual(len(self.cache), 5)
+        self.assertIsNone(self.cache.get("key0"))
+        self.assertEqual(self.cache.get("key7"), 7)
@@ -0,0 +1,40 @@
+import unittest
+
+from pygranule.swath_ribbon import SwathRibbon
+from datetime import datetime, timedelta
+import numpy as np
+
+
+class TestSwathRibbon(unittest.TestCase):
+    def setUp(self):
+        self.oob = 1.0e30
+        self.t0 = datetime(2014,2,25,13,0)
+        # 4 scan lines of 3 pixels, 1 minute apart
+        xs = np.array([[0.,1.,2.]]*4)
+        ys = np.array([[0.,0.,0.],
+                       [1.,1.,1.],
+                       [2.,2.,2.],
+                       [3.,3.,3.]])
+        ys[3,0] = self.oob
+        self.ribbon = SwathRibbon(self.t0, timedelta(minutes=1), xs, ys, ('line1','line2'), self.oob)
+
+    def test_covers(self):
+        # Assert
+        self.assertTrue(self.ribbon.covers(self.t0, self.t0 + timedelta(minutes=3)))
+        self.assertFalse(self.ribbon.covers(self.t0, self.t0 + timedelta(minutes=3, seconds=1)))
+        self.assertFalse(self.ribbon.covers(self.t0 - timedelta(seconds=1), self.t0))
+
+    def test_scan_lines(self):
+        # Run
+        xs, ys = self.ribbon.scan_lines(self.t0 + timedelta(seconds=30), [0.0, 0.5, 1.0, 2.5])
+        # Assert
+        self.assertEqual(xs[:3].tolist(), [[0.,1.,2.]]*3)
+        self.assertEqual(ys[:3].tolist(), [[0.5,0.5,0.5],[1.,1.,1.],[1.5,1.5,1.5]])
+        self.assertEqual(ys[3].tolist(), [self.oob,3.,3.])
+        self.assertEqual(xs[3].tolist(), [self.oob,1.,2.])
+
+    def test_scan_lines_at_end(self):
+        # Run
+        xs, ys = self.ribbon.scan_lines(self.t0 + timedelta(minutes=2), [0.0, 1.0])
+        # Assert
+        self.assertEqual(ys.tolist(), [[2.,2.,2.],[self.oob,3.,3.]])
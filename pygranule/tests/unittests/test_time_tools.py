@@ -0,0 +1,28 @@
+import unittest
+
+from pygranule.time_tools import floor_granule_datetime, granule_slots
+from datetime import datetime, timedelta
+import numpy as np
+
+
+class TestTimeTools(unittest.TestCase):
+    def setUp(self):
+        self.step = timedelta(minutes=15)
+        self.offset = timedelta(minutes=5)
+        t0 = datetime(2014,1,23)
+        self.times = [ t0 + i*timedelta(minutes=5) for i in range(-3,300) ]
+
+    def test_granule_slots_vs_floor(self):
+        # Run
+        on_grid, slots = granule_slots(np.array(self.times, dtype='datetime64[us]'), self.step, self.offset)
+        # Assert
+        reference = [ floor_granule_datetime(t, self.step, self.offset) == t for t in self.times ]
+        self.assertEqual( on_grid.tolist(), reference )
+
+    def test_granule_slots_index(self):
+        times = np.array([datetime(2014,1,23,0,5), datetime(2014,1,23,13,20), None], dtype='datetime64[us]')
+        # Run
+        on_grid, slots = granule_slots(times, self.step, self.offset)
+        # Assert
+        self.assertEqual( on_grid.tolist(), [True, True, False] )
+        self.assertEqual( slots[:2].tolist(), [0, 53] )
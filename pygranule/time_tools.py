@@ -1,5 +1,6 @@
 
 from datetime import datetime, timedelta
+import numpy as np
 
 
 def divide_timedeltas(td1,td2):
@@ -14,3 +15,28 @@ def floor_granule_datetime(t, granulation, offset=timedelta(minutes=0)):
     floored = t1 + int( divide_timedeltas(d, granulation) )*granulation
 
     return floored
+
+
+_day_us = 86400*10**6
+
+def _timedelta_to_us(td):
+    return (td.days*86400 + td.seconds)*10**6 + td.microseconds
+
+def granule_slots(times, granulation, offset=timedelta(minutes=0)):
+    """
+    Vectorised counterpart of floor_granule_datetime,
+    for a numpy datetime64 array of time stamps.
+    Returns a tuple of numpy arrays (on_grid, slots), where on_grid is
+    True for time stamps that sit exactly on the granulation grid
+    (False for NaT), and slots is the number of whole granulation steps
+    from the grid origin (midnight + offset) of the time stamp's day.
+    """
+    us = np.asarray(times).astype('datetime64[us]')
+    valid = ~np.isnat(us)
+    t = us.astype(np.int64)
+    step = _timedelta_to_us(granulation)
+    d = t - (t//_day_us)*_day_us - _timedelta_to_us(offset)
+    # truncate towards zero, as floor_granule_datetime does
+    slots = np.where(d >= 0, d//step, -((-d)//step))
+    on_grid = valid & (d%step == 0)
+    return on_grid, np.where(valid, slots, 0)